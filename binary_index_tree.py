@@ -1,35 +1,464 @@
+from __future__ import annotations
 import unittest
+from array import array
+from collections.abc import Iterable
 from itertools import accumulate
+import math
+import random
+
+try:
+    import numpy as np
+except ImportError:  # numpy only backs the optional vectorized storage
+    np = None
+
+
+CHECKED = 'checked'
+WRAP = 'wrap'
+PROMOTE = 'promote'
 
 
 class BIT:
-    def __init__(self, n):
+    def __init__(self, n, dtype: object = None, overflow: str = CHECKED, modulus: int = None):
+        """
+        dtype picks the storage of the sums: None keeps Python ints in a list, an array module typecode such as 'q' or 'd' uses an array.array,
+        and a numpy dtype such as numpy.int32 uses a numpy.ndarray, which also lets update_many and get_sums run vectorized.
+        overflow decides what a fixed-width integer storage does when a sum no longer fits: CHECKED raises OverflowError,
+        WRAP wraps around like the machine type, and PROMOTE switches the storage to a list of Python ints.
+        modulus, if given, keeps every sum modulo it, so the storage must be able to hold modulus - 1.
+        """
+        if overflow not in (CHECKED, WRAP, PROMOTE):
+            raise Exception(f'unknown overflow mode {overflow}')
         self.n: int = n
+        self.overflow: str = overflow
+        self.modulus: int = modulus
         # self.sum[<blah>100] = a[<blah>000] + a[<blah>001] + a[<blah>010] + a[<blah>011]
-        self.sum: list[int] = [0 for i in range(n + 1)]
+        self.sum: list[int] = BIT.__make_storage(n + 1, dtype)
+        self.__limits: tuple[int, int] = BIT.__limits_of(self.sum)
+        if modulus is not None and self.__limits is not None and modulus - 1 > self.__limits[1]:
+            raise Exception(f'modulus {modulus} does not fit in {self.__limits[0]}..{self.__limits[1]}')
+        # no partial sum can exceed the sum of the absolute deltas applied so far, so while this fits the storage no check is needed
+        self.__abs_bound: int = 0
+
+    @staticmethod
+    def __make_storage(size: int, dtype: object) -> list[int]:
+        if dtype is None:
+            return [0] * size
+        if isinstance(dtype, str) and len(dtype) == 1:
+            return array(dtype, [0]) * size
+        return np.zeros(size, dtype=dtype)
+
+    @staticmethod
+    def __limits_of(storage: list[int]) -> tuple[int, int]:
+        """
+        the smallest and the largest storable value, or None for unbounded or floating-point storage
+        """
+        if isinstance(storage, array):
+            if storage.typecode in 'fd':
+                return None
+            bits = storage.itemsize * 8
+            return (-(1 << (bits - 1)), (1 << (bits - 1)) - 1) if storage.typecode.islower() else (0, (1 << bits) - 1)
+        if not isinstance(storage, list) and storage.dtype.kind in 'iu':
+            info = np.iinfo(storage.dtype)
+            return int(info.min), int(info.max)
+        return None
+
+    def __fits(self, abs_bound: int, non_negative: bool) -> bool:
+        lo, hi = self.__limits
+        return abs_bound <= hi and (abs_bound <= -lo or non_negative)
+
+    def __wrap(self, val: int) -> int:
+        lo, hi = self.__limits
+        return (val - lo) % (hi - lo + 1) + lo
+
+    def __mark_wrapped(self):
+        # a wrapped sum is no longer bounded by the absolute deltas, e.g., -1 wraps to 255 in unsigned bytes,
+        # so the bound is pushed past the storage limit and every later update takes the checked path
+        self.__abs_bound = max(self.__abs_bound, self.__limits[1] + 1)
+
+    def __promote(self):
+        self.sum = self.sum.tolist()
+        self.__limits = None
+
+    def __store(self, vals: list[int]):
+        """
+        replaces all sums with the exact vals, applying the overflow mode
+        """
+        if self.__limits is not None:
+            lo, hi = self.__limits
+            if any(val < lo or val > hi for val in vals):
+                if self.overflow == CHECKED:
+                    raise OverflowError(f'sums do not fit in {lo}..{hi}')
+                if self.overflow == PROMOTE:
+                    self.sum = vals
+                    self.__limits = None
+                    return
+                vals = [self.__wrap(val) for val in vals]
+                self.__mark_wrapped()
+        if isinstance(self.sum, list):
+            self.sum = vals
+        elif isinstance(self.sum, array):
+            self.sum = array(self.sum.typecode, vals)
+        else:
+            self.sum = np.array(vals, dtype=self.sum.dtype)
+
+    @classmethod
+    def from_iterable(cls, values: Iterable[int], dtype: object = None, overflow: str = CHECKED, modulus: int = None) -> BIT:
+        """
+        builds the tree in O(n) instead of n updates; values may be any iterable, including array.array and numpy.ndarray
+        """
+        if dtype is not None and not isinstance(dtype, str) and modulus is None:
+            values = np.asarray(values if hasattr(values, '__len__') else list(values))
+            bit = cls(len(values), dtype, overflow)
+            if bit.__limits is not None:
+                bit.__abs_bound = math.ceil(float(np.abs(values, dtype=np.float64).sum()))
+            non_negative = values.size == 0 or values.min() >= 0
+            if bit.__limits is None or overflow == WRAP or bit.__fits(bit.__abs_bound, non_negative):
+                bit.__from_ndarray(values.astype(bit.sum.dtype))
+                if bit.__limits is not None and not bit.__fits(bit.__abs_bound, non_negative):
+                    bit.__mark_wrapped()
+                return bit
+            values = values.tolist()
+
+        # tolist() turns array.array and numpy.ndarray buffers into plain ints in one C-level pass
+        sums = [0]
+        sums.extend(values.tolist() if hasattr(values, 'tolist') else values)
+        n = len(sums) - 1
+        for idx in range(1, n + 1):
+            parent = idx + (idx & (-idx))
+            if parent <= n:
+                sums[parent] += sums[idx]
+        if modulus is not None:
+            sums = [val % modulus for val in sums]
+
+        bit = cls(0, dtype, overflow, modulus)
+        bit.n = n
+        if dtype is None:
+            bit.sum = sums
+        else:
+            bit.__abs_bound = sum(abs(val) for val in sums[1:] if val)
+            bit.__store(sums)
+        return bit
+
+    def __from_ndarray(self, values: np.ndarray):
+        self.sum[1:] = values
+        # a node only receives from children with a smaller lowest set bit, so propagating one lowest-set-bit level at a time is exact
+        step = 1
+        while step <= self.n:
+            idx = np.arange(step, self.n + 1, 2 * step)
+            parent = idx + step
+            in_range = parent <= self.n
+            self.sum[parent[in_range]] += self.sum[idx[in_range]]
+            step <<= 1
 
     def update(self, idx: int, delta: int):
-        if idx >= self.n:
+        if idx < 0 or idx >= self.n:
             raise Exception("out of range")
         idx += 1
+        if self.modulus is not None:
+            delta %= self.modulus
+            while idx <= self.n:
+                self.sum[idx] = (int(self.sum[idx]) + delta) % self.modulus
+                idx += idx & (-idx)
+            return
+
+        if self.__limits is not None:
+            self.__abs_bound += abs(delta)
+            if not self.__fits(self.__abs_bound, delta >= 0):
+                self.__update_checked(idx, delta)
+                return
+
         while idx <= self.n:
             self.sum[idx] += delta
             # find the right-most set bit, set the first unset bit to its left, and unset all set bits to the newly set bit's right, e.g., 0001->0010, 0011->0100, 0110->1000
             idx += idx & (-idx)
 
+    def __update_checked(self, idx: int, delta: int):
+        path: list[int] = []
+        while idx <= self.n:
+            path.append(idx)
+            idx += idx & (-idx)
+        self.__store_exact(path, [int(self.sum[idx]) + delta for idx in path])
+
+    def __update_many_checked(self, indices: list[int], deltas: list[int]):
+        """
+        sums up the deltas reaching every node first, so the whole batch goes through one __store_exact
+        """
+        node_deltas: dict[int, int] = {}
+        for idx, delta in zip(indices, deltas):
+            idx += 1
+            while idx <= self.n:
+                node_deltas[idx] = node_deltas.get(idx, 0) + delta
+                idx += idx & (-idx)
+        self.__store_exact(list(node_deltas), [int(self.sum[idx]) + delta for idx, delta in node_deltas.items()])
+
+    def __store_exact(self, path: list[int], vals: list[int]):
+        # all new sums are computed exactly before storing any of them, so a CHECKED failure leaves the tree untouched
+        lo, hi = self.__limits
+        if any(val < lo or val > hi for val in vals):
+            if self.overflow == CHECKED:
+                raise OverflowError(f'sums do not fit in {lo}..{hi}')
+            elif self.overflow == WRAP:
+                vals = [self.__wrap(val) for val in vals]
+                self.__mark_wrapped()
+            else:
+                self.__promote()
+        for idx, val in zip(path, vals):
+            self.sum[idx] = val
+
     def get_sum(self, idx: int) -> int:
         """
         idx is exclusive, i.e., returns sum(a[:idx])
         """
-        if idx > self.n:
+        if idx < 0 or idx > self.n:
             raise Exception("out of range")
         result = 0
-        while idx > 0:
-            result += self.sum[idx]
-            idx &= idx - 1  # unset the last set bit
+        if self.__limits is None or isinstance(self.sum, array):
+            while idx > 0:
+                result += self.sum[idx]
+                idx &= idx - 1  # unset the last set bit
+        else:
+            # numpy integer scalars would silently wrap
+            while idx > 0:
+                result += int(self.sum[idx])
+                idx &= idx - 1
 
+        return self.__normalize(result)
+
+    def __normalize(self, result: int) -> int:
+        if self.modulus is not None:
+            return result % self.modulus
+        if self.__limits is not None and self.overflow == WRAP:
+            return self.__wrap(result)
         return result
 
+    def range_sum(self, lo: int, hi: int) -> int:
+        """
+        returns sum(a[lo:hi])
+        """
+        return self.__normalize(self.get_sum(hi) - self.get_sum(lo))
+
+    def update_many(self, indices: Iterable[int], deltas: Iterable[int]):
+        """
+        the same as calling update for every (idx, delta) pair; with ndarray storage every tree level is one numpy pass
+        """
+        if np is not None and isinstance(self.sum, np.ndarray):
+            idx = np.asarray(indices, dtype=np.int64)
+            delta = np.asarray(deltas)
+            if idx.size and (idx.min() < 0 or idx.max() >= self.n):
+                raise Exception("out of range")
+            if self.modulus is not None:
+                # every level adds at most len(delta) values below 2 ** 31 onto a sum below 2 ** 31
+                vectorized = self.modulus <= 1 << 31 and self.sum.dtype == np.int64 and idx.size < 1 << 31
+                if vectorized:
+                    delta = delta.astype(np.int64) % self.modulus
+            elif self.__limits is None:
+                vectorized = True
+            else:
+                abs_bound = self.__abs_bound + math.ceil(float(np.abs(delta, dtype=np.float64).sum()))
+                # WRAP always runs vectorized, but still records the bound, so later scalar updates check for wrapping
+                fits = self.__fits(abs_bound, delta.size == 0 or delta.min() >= 0)
+                vectorized = self.overflow == WRAP or fits
+                if vectorized:
+                    self.__abs_bound = abs_bound
+                    if not fits:
+                        self.__mark_wrapped()
+
+            if vectorized:
+                delta = delta.astype(self.sum.dtype)
+                idx = idx + 1
+                while idx.size:
+                    # add.at accumulates repeated indices, unlike fancy-index assignment
+                    np.add.at(self.sum, idx, delta)
+                    if self.modulus is not None:
+                        self.sum[idx] %= self.modulus
+                    idx += idx & (-idx)
+                    in_range = idx <= self.n
+                    idx, delta = idx[in_range], delta[in_range]
+                return
+
+            indices, deltas = idx.tolist(), delta.tolist()
+
+        indices, deltas = list(indices), list(deltas)
+        if any(idx < 0 or idx >= self.n for idx in indices):
+            raise Exception("out of range")
+        if self.modulus is None and self.__limits is not None and \
+                not self.__fits(self.__abs_bound + sum(abs(delta) for delta in deltas), all(delta >= 0 for delta in deltas)):
+            # applying the deltas one by one could fail halfway, so the batch is checked as a whole
+            self.__abs_bound += sum(abs(delta) for delta in deltas)
+            self.__update_many_checked(indices, deltas)
+            return
+        for idx, delta in zip(indices, deltas):
+            self.update(idx, delta)
+
+    def get_sums(self, indices: Iterable[int]) -> list[int]:
+        """
+        the same as calling get_sum for every idx; with ndarray storage every tree level is one numpy pass and an ndarray is returned
+        """
+        if np is not None and isinstance(self.sum, np.ndarray):
+            idx = np.array(indices, dtype=np.int64)
+            if idx.size and (idx.min() < 0 or idx.max() > self.n):
+                raise Exception("out of range")
+            # modulus comes first: modular sums are reduced only at the end, so they must not wrap on the way
+            if self.modulus is not None:
+                exact = self.__limits is not None and self.modulus * 64 > self.__limits[1]
+            elif self.__limits is None or self.overflow == WRAP:
+                exact = False
+            else:
+                exact = not self.__fits(self.__abs_bound, False)
+            # an object array adds Python ints, so prefix sums wider than the storage stay exact
+            result = np.zeros(idx.shape, dtype=object if exact else self.sum.dtype)
+            while idx.any():
+                # self.sum[0] is always 0, so finished indices keep adding nothing
+                result += self.sum[idx].astype(object) if exact else self.sum[idx]
+                idx &= idx - 1
+            return result % self.modulus if self.modulus is not None else result
+
+        return [self.get_sum(idx) for idx in indices]
+
+    def lower_bound(self, k: int) -> int:
+        """
+        returns the smallest idx such that sum(a[:idx + 1]) >= k, or n if there is none; all a[i] must be non-negative.
+        descends from the highest power of two instead of binary searching over get_sum, so it costs O(log n)
+        """
+        idx = 0
+        step = 1 << (self.n.bit_length() - 1) if self.n else 0
+        while step:
+            # self.sum[idx + step] covers a[idx:idx + step] when idx is a multiple of 2 * step
+            if idx + step <= self.n and self.sum[idx + step] < k:
+                idx += step
+                k -= self.sum[idx]
+            step >>= 1
+
+        return idx
+
+
+class BITMultiset:
+    """
+    an order-statistic multiset over the integers [0, universe), backed by a BIT of per-value counts
+    """
+
+    def __init__(self, universe: int):
+        self.counts: BIT = BIT(universe)
+        self.size: int = 0
+
+    def add(self, val: int, count: int = 1):
+        if val < 0 or val >= self.counts.n:
+            raise Exception("out of range")
+        self.counts.update(val, count)
+        self.size += count
+
+    def remove(self, val: int, count: int = 1):
+        if val not in self or self.count(val) < count:
+            raise Exception(f'{val} does not exist')
+        self.counts.update(val, -count)
+        self.size -= count
+
+    def count(self, val: int) -> int:
+        return self.counts.range_sum(val, val + 1)
+
+    def rank(self, val: int) -> int:
+        """
+        number of elements smaller than val
+        """
+        return self.counts.get_sum(val)
+
+    def select(self, k: int) -> int:
+        """
+        the k-th (0-based) smallest element
+        """
+        if k < 0 or k >= self.size:
+            raise Exception("out of range")
+        return self.counts.lower_bound(k + 1)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, val: int) -> bool:
+        return 0 <= val < self.counts.n and self.count(val) > 0
+
+
+class RangeBIT:
+    """
+    range add and range sum over two BITs: d holds the difference array of a, and d_idx holds d[i] * i, so that
+    sum(a[:idx]) = idx * sum(d[:idx]) - sum(d_idx[:idx])
+    """
+
+    def __init__(self, n):
+        self.n: int = n
+        self.d: BIT = BIT(n)
+        self.d_idx: BIT = BIT(n)
+
+    def range_add(self, lo: int, hi: int, delta: int):
+        """
+        adds delta to every a[lo:hi]
+        """
+        if lo < 0 or lo > hi or hi > self.n:
+            raise Exception("out of range")
+        if lo == hi:
+            return
+        self.d.update(lo, delta)
+        self.d_idx.update(lo, delta * lo)
+        if hi < self.n:
+            self.d.update(hi, -delta)
+            self.d_idx.update(hi, -delta * hi)
+
+    def update(self, idx: int, delta: int):
+        self.range_add(idx, idx + 1, delta)
+
+    def get_sum(self, idx: int) -> int:
+        """
+        idx is exclusive, i.e., returns sum(a[:idx])
+        """
+        return idx * self.d.get_sum(idx) - self.d_idx.get_sum(idx)
+
+    def range_sum(self, lo: int, hi: int) -> int:
+        """
+        returns sum(a[lo:hi])
+        """
+        return self.get_sum(hi) - self.get_sum(lo)
+
+
+class BIT2D:
+    def __init__(self, rows, cols):
+        self.rows: int = rows
+        self.cols: int = cols
+        self.sum: list[list[int]] = [[0] * (cols + 1) for _ in range(rows + 1)]
+
+    def update(self, row: int, col: int, delta: int):
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            raise Exception("out of range")
+        row += 1
+        while row <= self.rows:
+            sum_row = self.sum[row]
+            cur_col = col + 1
+            while cur_col <= self.cols:
+                sum_row[cur_col] += delta
+                cur_col += cur_col & (-cur_col)
+            row += row & (-row)
+
+    def get_sum(self, row: int, col: int) -> int:
+        """
+        row and col are exclusive, i.e., returns the sum of a[:row][:col]
+        """
+        if not (0 <= row <= self.rows and 0 <= col <= self.cols):
+            raise Exception("out of range")
+        result = 0
+        while row > 0:
+            sum_row = self.sum[row]
+            cur_col = col
+            while cur_col > 0:
+                result += sum_row[cur_col]
+                cur_col &= cur_col - 1
+            row &= row - 1
+
+        return result
+
+    def range_sum(self, row_lo: int, col_lo: int, row_hi: int, col_hi: int) -> int:
+        """
+        returns the sum of a[row_lo:row_hi][col_lo:col_hi]
+        """
+        return self.get_sum(row_hi, col_hi) - self.get_sum(row_lo, col_hi) - self.get_sum(row_hi, col_lo) + self.get_sum(row_lo, col_lo)
+
 
 class TestingBit(unittest.TestCase):
     def test_basic(self):
@@ -42,6 +471,222 @@ class TestingBit(unittest.TestCase):
         for first_n, expected_sum in enumerate(expected_sums):
             self.assertEqual(expected_sum, bit.get_sum(first_n))
 
+    def test_from_iterable(self):
+        arr: list[int] = [5, -2, 7, 0, 3, 3, 9, 1, 4]
+        expected = BIT(len(arr))
+        for idx, num in enumerate(arr):
+            expected.update(idx, num)
+        self.assertListEqual(expected.sum, BIT.from_iterable(arr).sum)
+        self.assertListEqual(expected.sum, BIT.from_iterable(iter(arr)).sum)
+        self.assertListEqual(expected.sum, BIT.from_iterable(array('q', arr)).sum)
+        self.assertEqual(0, BIT.from_iterable([]).get_sum(0))
+
+
+    def test_range_sum(self):
+        arr: list[int] = [1, 2, 3, 4, 5, 6, 7, 8]
+        bit = BIT.from_iterable(arr)
+        for lo in range(len(arr) + 1):
+            for hi in range(lo, len(arr) + 1):
+                self.assertEqual(sum(arr[lo:hi]), bit.range_sum(lo, hi))
+
+    def test_many(self):
+        arr: list[int] = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3]
+        indices: list[int] = [0, 3, 3, 9, 5, 1]
+        deltas: list[int] = [2, -1, 7, 4, 0, 10]
+        bit = BIT.from_iterable(arr)
+        bit.update_many(indices, deltas)
+        for idx, delta in zip(indices, deltas):
+            arr[idx] += delta
+        self.assertListEqual([sum(arr[:idx]) for idx in range(len(arr) + 1)], bit.get_sums(range(len(arr) + 1)))
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_many_ndarray(self):
+        rnd = np.random.default_rng(0)
+        arr = rnd.integers(-100, 100, 1000)
+        bit = BIT.from_iterable(arr, np.int64)
+        expected = BIT.from_iterable(arr)
+        self.assertListEqual(expected.sum, bit.sum.tolist())
+
+        indices = rnd.integers(0, 1000, 5000)
+        deltas = rnd.integers(-100, 100, 5000)
+        bit.update_many(indices, deltas)
+        expected.update_many(indices.tolist(), deltas.tolist())
+        queries = rnd.integers(0, 1001, 5000)
+        self.assertListEqual(expected.get_sums(queries.tolist()), bit.get_sums(queries).tolist())
+        self.assertRaises(Exception, bit.update_many, [1000], [1])
+        self.assertRaises(Exception, bit.get_sums, [1001])
+        self.assertRaises(Exception, bit.get_sums, [-1])
+        self.assertRaises(Exception, expected.get_sums, [-1])
+
+    def test_typed_storage(self):
+        arr: list[int] = [3, 1, 4, 1, 5, 9, 2, 6]
+        for dtype in ['q', 'l', 'd'] + ([np.int32, np.float64] if np is not None else []):
+            bit = BIT.from_iterable(arr, dtype)
+            bit.update(2, 10)
+            self.assertListEqual([sum(arr[:idx]) + (10 if idx > 2 else 0) for idx in range(len(arr) + 1)],
+                                 [bit.get_sum(idx) for idx in range(len(arr) + 1)], dtype)
+        self.assertIsInstance(BIT(4, 'q').sum, array)
+
+    def test_overflow_checked(self):
+        bit = BIT.from_iterable([120, 5], 'b')
+        self.assertRaises(OverflowError, bit.update, 0, 10)
+        self.assertEqual(125, bit.get_sum(2))
+        self.assertRaises(OverflowError, BIT.from_iterable, [100, 100], 'b')
+        bit.update(1, -100)
+        self.assertEqual(25, bit.get_sum(2))
+
+    def test_overflow_wrap(self):
+        bit = BIT.from_iterable([120, 5], 'b', WRAP)
+        bit.update(0, 10)
+        self.assertEqual(-126, bit.get_sum(1))
+        self.assertEqual(-121, bit.get_sum(2))
+        self.assertEqual(5, bit.range_sum(1, 2))
+
+    def test_overflow_promote(self):
+        bit = BIT.from_iterable([120, 5], 'b', PROMOTE)
+        bit.update(0, 10)
+        self.assertEqual(130, bit.get_sum(1))
+        self.assertEqual(135, bit.get_sum(2))
+        self.assertIsInstance(bit.sum, list)
+
+    def test_modulus(self):
+        arr: list[int] = [7, 12, 5, 30, 2]
+        for dtype in [None, 'q'] + ([np.int64] if np is not None else []):
+            bit = BIT.from_iterable(arr, dtype, modulus=11)
+            bit.update(3, -4)
+            bit.update_many([0, 0, 4], [100, 1, 9])
+            expected = [7 + 101, 12, 5, 26, 11]
+            self.assertListEqual([sum(expected[:idx]) % 11 for idx in range(len(arr) + 1)], list(bit.get_sums(range(len(arr) + 1))))
+            self.assertEqual(sum(expected[1:4]) % 11, bit.range_sum(1, 4))
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_overflow_ndarray(self):
+        bit = BIT.from_iterable([2 ** 30, 2 ** 29], np.int32)
+        self.assertRaises(OverflowError, bit.update_many, [0], [2 ** 29])
+        self.assertListEqual([0, 2 ** 30, 2 ** 30 + 2 ** 29], list(bit.get_sums([0, 1, 2])))
+
+        bit = BIT(2, np.int32, PROMOTE)
+        bit.update_many([0, 1, 1], [2 ** 31 - 1, 2 ** 31 - 1, 5])
+        self.assertListEqual([0, 2 ** 31 - 1, 2 ** 32 + 3], bit.get_sums([0, 1, 2]))
+
+        bit = BIT(2, np.int32, WRAP)
+        bit.update_many([0, 1], [2 ** 31 - 1, 1])
+        self.assertListEqual([0, 2 ** 31 - 1, -2 ** 31], bit.get_sums([0, 1, 2]).tolist())
+        self.assertEqual(-2 ** 31, bit.get_sum(2))
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_ndarray_matches_scalar(self):
+        rnd = np.random.default_rng(1)
+        for dtype, overflow, modulus in [(np.int8, WRAP, 101), (np.int8, CHECKED, 101), (np.int16, WRAP, None),
+                                         (np.uint8, WRAP, None), (np.int64, CHECKED, 1000003)]:
+            bit = BIT(50, dtype, overflow, modulus)
+            for _ in range(20):
+                bit.update_many(rnd.integers(0, 50, 10), rnd.integers(-100 if modulus else 0, 100, 10))
+                bit.update(int(rnd.integers(0, 50)), int(rnd.integers(0, 100)))
+                self.assertListEqual([bit.get_sum(idx) for idx in range(51)], bit.get_sums(range(51)).tolist(), (dtype, modulus))
+        self.assertRaises(Exception, BIT, 4, np.uint8, modulus=1000003)
+        self.assertRaises(Exception, BIT.from_iterable, [1, 2], 'b', modulus=1000)
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_wrap_then_scalar_update(self):
+        bit = BIT(2, np.int8, WRAP)
+        bit.update_many([0, 0], [100, 100])
+        with np.errstate(over='raise'):
+            bit.update(0, -100)
+        self.assertEqual(100, bit.get_sum(1))
+
+    def test_unsigned_wrap(self):
+        bit = BIT(4, 'B', WRAP)
+        bit.update(1, -1)
+        bit.update(0, 1)
+        self.assertListEqual([0, 1, 0, 0, 0], [bit.get_sum(idx) for idx in range(5)])
+
+        rnd = random.Random(0)
+        for dtype in ['B', 'H'] + ([np.uint8, np.uint16] if np is not None else []):
+            bits = 8 if dtype in ('B', np.uint8) else 16
+            arr = [rnd.randrange(-300, 300) for _ in range(20)]
+            bit = BIT.from_iterable(arr, dtype, WRAP)
+            for _ in range(300):
+                idx, delta = rnd.randrange(20), rnd.randrange(-300, 300)
+                if rnd.random() < 0.2:
+                    bit.update_many([idx], [delta])
+                else:
+                    bit.update(idx, delta)
+                arr[idx] += delta
+                k = rnd.randrange(21)
+                self.assertEqual(sum(arr[:k]) % (1 << bits), bit.get_sum(k), dtype)
+            if np is not None:
+                expected = [sum(arr[:k]) % (1 << bits) for k in range(21)]
+                self.assertListEqual(expected, [int(val) for val in bit.get_sums(range(21))], dtype)
+
+    def test_update_many_checked_is_atomic(self):
+        for dtype in ['b'] + ([np.int8] if np is not None else []):
+            bit = BIT.from_iterable([100, 0, 0], dtype)
+            self.assertRaises(OverflowError, bit.update_many, [1, 2, 0], [5, 5, 50])
+            self.assertListEqual([0, 100, 100, 100], [bit.get_sum(idx) for idx in range(4)], dtype)
+            bit.update_many([1, 2, 0], [5, 5, -50])
+            self.assertListEqual([0, 50, 55, 60], [bit.get_sum(idx) for idx in range(4)], dtype)
+
+    def test_lower_bound(self):
+        arr: list[int] = [0, 2, 0, 0, 3, 1, 0, 4]
+        bit = BIT.from_iterable(arr)
+        for k in range(sum(arr) + 2):
+            expected = next((idx for idx in range(len(arr)) if sum(arr[:idx + 1]) >= k), len(arr))
+            self.assertEqual(expected, bit.lower_bound(k))
+        self.assertEqual(0, BIT(0).lower_bound(1))
+
+    def test_multiset(self):
+        multiset = BITMultiset(10)
+        for val in [5, 1, 5, 9, 0]:
+            multiset.add(val)
+        self.assertEqual(5, len(multiset))
+        self.assertListEqual([0, 1, 5, 5, 9], [multiset.select(k) for k in range(5)])
+        self.assertEqual(2, multiset.rank(5))
+        self.assertEqual(4, multiset.rank(9))
+        self.assertEqual(2, multiset.count(5))
+        multiset.remove(5)
+        self.assertListEqual([0, 1, 5, 9], [multiset.select(k) for k in range(4)])
+        self.assertNotIn(3, multiset)
+        self.assertRaises(Exception, multiset.remove, 3)
+        self.assertRaises(Exception, multiset.select, 4)
+        self.assertRaises(Exception, multiset.add, -1)
+        self.assertRaises(Exception, multiset.add, 10)
+        self.assertRaises(Exception, multiset.remove, -1)
+        self.assertRaises(Exception, BIT(4).update, -1, 1)
+        self.assertRaises(Exception, BIT(4).update_many, [0, -1], [1, 1])
+
+    def test_range_bit(self):
+        arr: list[int] = [0] * 10
+        bit = RangeBIT(len(arr))
+        for lo, hi, delta in [(0, 10, 1), (2, 5, 3), (7, 8, -4), (9, 10, 2), (4, 4, 100)]:
+            bit.range_add(lo, hi, delta)
+            for idx in range(lo, hi):
+                arr[idx] += delta
+        bit.update(3, 5)
+        arr[3] += 5
+        for lo in range(len(arr) + 1):
+            for hi in range(lo, len(arr) + 1):
+                self.assertEqual(sum(arr[lo:hi]), bit.range_sum(lo, hi))
+        self.assertRaises(Exception, bit.range_add, 5, 11, 1)
+
+    def test_bit_2d(self):
+        grid: list[list[int]] = [[r * 4 + c for c in range(4)] for r in range(3)]
+        bit = BIT2D(3, 4)
+        for r, row in enumerate(grid):
+            for c, num in enumerate(row):
+                bit.update(r, c, num)
+        for row_lo in range(4):
+            for row_hi in range(row_lo, 4):
+                for col_lo in range(5):
+                    for col_hi in range(col_lo, 5):
+                        expected = sum(sum(row[col_lo:col_hi]) for row in grid[row_lo:row_hi])
+                        self.assertEqual(expected, bit.range_sum(row_lo, col_lo, row_hi, col_hi))
+        self.assertRaises(Exception, bit.update, -1, 0, 1)
+        self.assertRaises(Exception, bit.update, 0, -1, 1)
+        self.assertRaises(Exception, bit.update, 3, 0, 1)
+        self.assertRaises(Exception, bit.get_sum, -1, 2)
+        self.assertRaises(Exception, bit.get_sum, 2, -1)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import sys
 import unittest
 
@@ -10,6 +10,8 @@ class Node:
     val: object
     left: Node = None
     right: Node = None
+    parent: Node = field(default=None, repr=False, compare=False)
+    size: int = field(default=1, compare=False)  # number of nodes in the subtree rooted here
 
 
 class SmallestDummy:
@@ -33,20 +35,36 @@ class BinarySearchTree:
                 if cur.left:
                     cur = cur.left
                 else:
-                    cur.left = Node(key, val)
+                    cur.left = Node(key, val, parent=cur)
+                    self._resize_upwards(cur)
                     return True
             else:
                 if cur.right:
                     cur = cur.right
                 else:
-                    cur.right = Node(key, val)
+                    cur.right = Node(key, val, parent=cur)
+                    self._resize_upwards(cur)
                     return True
 
+    @staticmethod
+    def _size(node: Node) -> int:
+        return node.size if node else 0
+
+    def _resize_upwards(self, node: Node):
+        """
+        recomputes the subtree sizes from node up to the root, after the subtrees below node have changed
+        """
+        while node is not self._sentry:
+            node.size = 1 + BinarySearchTree._size(node.left) + BinarySearchTree._size(node.right)
+            node = node.parent
+
     def __replace_node(self, target: Node, child: Node, new_child: Node):
         if target.left is child:
             target.left = new_child
         else:
             target.right = new_child
+        if new_child:
+            new_child.parent = target
 
     def delete(self, key: object):
         pre = self._sentry
@@ -63,18 +81,25 @@ class BinarySearchTree:
 
         if not cur.left:
             self.__replace_node(pre, cur, cur.right)
+            self._resize_upwards(pre)
         elif not cur.right:
             self.__replace_node(pre, cur, cur.left)
+            self._resize_upwards(pre)
         else:
             # left rotate
             max_smaller_node = cur.left
             while max_smaller_node.right:
                 max_smaller_node = max_smaller_node.right
             max_smaller_node.right = cur.right.left
+            if max_smaller_node.right:
+                max_smaller_node.right.parent = max_smaller_node
             cur.right.left = cur.left
+            cur.left.parent = cur.right
             cur.left = None
             self.__replace_node(pre, cur, cur.right)
             cur.right = None
+            # max_smaller_node is now below cur's old right child, and every changed subtree lies on its path to the root
+            self._resize_upwards(max_smaller_node)
 
     def find(self, key: object) -> object:
         cur = self._sentry.right
@@ -86,36 +111,239 @@ class BinarySearchTree:
 
         return None if not cur else cur.val
 
-    def __iter__(self):
+    def _successor(self, node: Node) -> Node:
+        """
+        the next node in key order, or the sentry after the largest one
+        """
+        if node.right:
+            node = node.right
+            while node.left:
+                node = node.left
+            return node
+        parent = node.parent
+        while parent is not self._sentry and parent.right is node:
+            node, parent = parent, parent.parent
+        return parent
+
+    def __len__(self) -> int:
+        return BinarySearchTree._size(self._sentry.right)
+
+    def floor(self, key: object) -> tuple[object, object]:
+        """
+        (key, val) of the largest key not larger than key, or None
+        """
+        result = None
         cur = self._sentry.right
         while cur:
-            if not cur.left:
-                yield (cur.key, cur.val)
+            if cur.key == key:
+                return (cur.key, cur.val)
+            if key < cur.key:
+                cur = cur.left
+            else:
+                result = cur
                 cur = cur.right
+
+        return None if not result else (result.key, result.val)
+
+    def __ceiling_node(self, key: object) -> Node:
+        result = None
+        cur = self._sentry.right
+        while cur:
+            if cur.key == key:
+                return cur
+            if key < cur.key:
+                result = cur
+                cur = cur.left
             else:
-                temp = cur.left
-                while temp.right and temp.right != cur:
-                    temp = temp.right
+                cur = cur.right
 
-                if not temp.right:
-                    temp.right = cur
-                    cur = cur.left
-                else:  # left subtree of cur has already been traversed
-                    temp.right = None
-                    yield (cur.key, cur.val)
-                    cur = cur.right
+        return result
+
+    def ceiling(self, key: object) -> tuple[object, object]:
+        """
+        (key, val) of the smallest key not smaller than key, or None
+        """
+        result = self.__ceiling_node(key)
+        return None if not result else (result.key, result.val)
+
+    def range(self, lo: object, hi: object):
+        """
+        yields (key, val) for lo <= key < hi in key order; only the path to lo and the k matching nodes are visited
+        """
+        cur = self.__ceiling_node(lo)
+        while cur and cur is not self._sentry and cur.key < hi:
+            yield (cur.key, cur.val)
+            cur = self._successor(cur)
+
+    def rank(self, key: object) -> int:
+        """
+        number of keys smaller than key
+        """
+        result = 0
+        cur = self._sentry.right
+        while cur:
+            if cur.key == key:
+                return result + BinarySearchTree._size(cur.left)
+            if key < cur.key:
+                cur = cur.left
+            else:
+                result += BinarySearchTree._size(cur.left) + 1
+                cur = cur.right
+
+        return result
+
+    def select(self, k: int) -> tuple[object, object]:
+        """
+        (key, val) of the k-th (0-based) smallest key
+        """
+        if k < 0 or k >= len(self):
+            raise Exception('out of range')
+        cur = self._sentry.right
+        while True:
+            left_size = BinarySearchTree._size(cur.left)
+            if k == left_size:
+                return (cur.key, cur.val)
+            if k < left_size:
+                cur = cur.left
+            else:
+                k -= left_size + 1
+                cur = cur.right
+
+    def __iter__(self):
+        """
+        walks parent pointers instead of rewriting links, so the tree is never modified and any number of readers can iterate at once
+        """
+        cur = self._sentry.right
+        if not cur:
+            return
+        while cur.left:
+            cur = cur.left
+        while cur is not self._sentry:
+            yield (cur.key, cur.val)
+            cur = self._successor(cur)
+
+
+@dataclass
+class AVLNode(Node):
+    height: int = 1
+
+
+class AVLTree(BinarySearchTree):
+    """
+    a BinarySearchTree kept height-balanced, so insert, delete and find stay O(log n) even for sorted keys
+    """
+
+    def insert(self, key: object, val: object) -> bool:
+        """
+        True if insertion succeeds; otherwise False, indicating the key has already existed in the tree.
+        """
+        self._sentry.right, inserted = self.__insert(self._sentry.right, key, val)
+        self._sentry.right.parent = self._sentry
+        return inserted
+
+    def __insert(self, node: AVLNode, key: object, val: object) -> tuple[AVLNode, bool]:
+        if not node:
+            return AVLNode(key, val), True
+        if node.key == key:
+            return node, False
+        if key < node.key:
+            node.left, inserted = self.__insert(node.left, key, val)
+            node.left.parent = node
+        else:
+            node.right, inserted = self.__insert(node.right, key, val)
+            node.right.parent = node
+        return (AVLTree.__rebalance(node) if inserted else node), inserted
+
+    def delete(self, key: object):
+        self._sentry.right = self.__delete(self._sentry.right, key)
+        if self._sentry.right:
+            self._sentry.right.parent = self._sentry
+
+    def __delete(self, node: AVLNode, key: object) -> AVLNode:
+        if not node:
+            raise Exception(f'cannot find {key}')
+        if node.key == key:
+            if not node.left:
+                return node.right
+            if not node.right:
+                return node.left
+            successor = node.right
+            while successor.left:
+                successor = successor.left
+            node.key, node.val = successor.key, successor.val
+            node.right = self.__delete(node.right, successor.key)
+        elif key < node.key:
+            node.left = self.__delete(node.left, key)
+        else:
+            node.right = self.__delete(node.right, key)
+        for child in (node.left, node.right):
+            if child:
+                child.parent = node
+        return AVLTree.__rebalance(node)
+
+    @staticmethod
+    def __height(node: AVLNode) -> int:
+        return node.height if node else 0
+
+    @staticmethod
+    def __update_height_and_size(node: AVLNode):
+        node.height = max(AVLTree.__height(node.left), AVLTree.__height(node.right)) + 1
+        node.size = 1 + BinarySearchTree._size(node.left) + BinarySearchTree._size(node.right)
+
+    @staticmethod
+    def __rotate_left(node: AVLNode) -> AVLNode:
+        pivot = node.right
+        node.right = pivot.left
+        if node.right:
+            node.right.parent = node
+        pivot.left = node
+        pivot.parent, node.parent = node.parent, pivot
+        AVLTree.__update_height_and_size(node)
+        AVLTree.__update_height_and_size(pivot)
+        return pivot
+
+    @staticmethod
+    def __rotate_right(node: AVLNode) -> AVLNode:
+        pivot = node.left
+        node.left = pivot.right
+        if node.left:
+            node.left.parent = node
+        pivot.right = node
+        pivot.parent, node.parent = node.parent, pivot
+        AVLTree.__update_height_and_size(node)
+        AVLTree.__update_height_and_size(pivot)
+        return pivot
+
+    @staticmethod
+    def __rebalance(node: AVLNode) -> AVLNode:
+        AVLTree.__update_height_and_size(node)
+        balance = AVLTree.__height(node.left) - AVLTree.__height(node.right)
+        if balance > 1:
+            if AVLTree.__height(node.left.left) < AVLTree.__height(node.left.right):
+                node.left = AVLTree.__rotate_left(node.left)
+            return AVLTree.__rotate_right(node)
+        if balance < -1:
+            if AVLTree.__height(node.right.right) < AVLTree.__height(node.right.left):
+                node.right = AVLTree.__rotate_right(node.right)
+            return AVLTree.__rotate_left(node)
+        return node
+
+    def height(self) -> int:
+        return AVLTree.__height(self._sentry.right)
 
 
 class BstTest(unittest.TestCase):
+    TREE = BinarySearchTree
+
     def test_insert(self):
-        bst = BinarySearchTree()
+        bst = self.TREE()
         self.assertTrue(bst.insert(1, 'A'))
         self.assertFalse(bst.insert(1, 'A'))
         self.assertTrue(bst.insert(2, 'B'))
         self.assertFalse(bst.insert(2, 'B'))
 
     def test_iter(self):
-        bst = BinarySearchTree()
+        bst = self.TREE()
         for i, j in zip(range(4), range(7, 11)):
             bst.insert(i, chr(i + 65))
             bst.insert(j, chr(j + 65))
@@ -124,7 +352,7 @@ class BstTest(unittest.TestCase):
                              (7, 'H'), (8, 'I'), (9, 'J'), (10, 'K')], list(iter(bst)))
 
     def test_delete_exists_1(self):
-        bst = BinarySearchTree()
+        bst = self.TREE()
         bst.insert(1, 'B')
         bst.insert(0, 'A')
         bst.insert(2, 'C')
@@ -132,7 +360,7 @@ class BstTest(unittest.TestCase):
         self.assertListEqual([(0, 'A'), (2, 'C')], list(iter(bst)))
 
     def test_delete_exists_2(self):
-        bst = BinarySearchTree()
+        bst = self.TREE()
         for i, j in zip(range(4), range(7, 11)):
             bst.insert(i, chr(i + 65))
             bst.insert(j, chr(j + 65))
@@ -143,27 +371,121 @@ class BstTest(unittest.TestCase):
 
         self.assertListEqual([(1, 'B'), (3, 'D'), (7, 'H'), (8, 'I'), (9, 'J')], list(iter(bst)))
         
+    def test_iter_does_not_modify_tree(self):
+        bst = self.TREE()
+        for i in [5, 2, 8, 1, 3, 7, 9, 4, 6, 0]:
+            bst.insert(i, chr(i + 65))
+
+        it = iter(bst)
+        self.assertListEqual([(0, 'A'), (1, 'B'), (2, 'C')], [next(it) for _ in range(3)])
+        for i in range(10):
+            self.assertEqual(chr(i + 65), bst.find(i))
+        other = iter(bst)
+        self.assertEqual((0, 'A'), next(other))
+        self.assertListEqual([(i, chr(i + 65)) for i in range(3, 10)], list(it))
+        self.assertListEqual([(i, chr(i + 65)) for i in range(1, 10)], list(other))
+
+    def test_iter_after_deletes(self):
+        bst = self.TREE()
+        keys = [(i * 37) % 101 for i in range(101)]
+        for key in keys:
+            bst.insert(key, key)
+        for key in keys[::3]:
+            bst.delete(key)
+        self.assertListEqual(sorted((key, key) for key in keys if key not in keys[::3]), list(bst))
+
+    def test_parent_pointers(self):
+        bst = self.TREE()
+        keys = [(i * 37) % 101 for i in range(101)]
+        for key in keys:
+            bst.insert(key, key)
+        for key in keys[::3]:
+            bst.delete(key)
+
+        stack = [bst._sentry]
+        while stack:
+            node = stack.pop()
+            for child in (node.left, node.right):
+                if child:
+                    self.assertIs(node, child.parent)
+                    stack.append(child)
+
+    def test_order_statistics(self):
+        bst = self.TREE()
+        keys = [(i * 37) % 101 * 2 for i in range(101)]
+        for key in keys:
+            bst.insert(key, str(key))
+        for key in keys[::3]:
+            bst.delete(key)
+        remaining = sorted(key for key in keys if key not in keys[::3])
+
+        self.assertEqual(len(remaining), len(bst))
+        for k, key in enumerate(remaining):
+            self.assertEqual((key, str(key)), bst.select(k))
+            self.assertEqual(k, bst.rank(key))
+            self.assertEqual(k + 1, bst.rank(key + 1))
+        self.assertRaises(Exception, bst.select, len(remaining))
+        self.assertRaises(Exception, bst.select, -1)
+
+    def test_floor_and_ceiling(self):
+        bst = self.TREE()
+        for key in [10, 20, 30, 40]:
+            bst.insert(key, str(key))
+        self.assertIsNone(bst.floor(9))
+        self.assertEqual((10, '10'), bst.floor(10))
+        self.assertEqual((20, '20'), bst.floor(29))
+        self.assertEqual((40, '40'), bst.floor(100))
+        self.assertEqual((10, '10'), bst.ceiling(0))
+        self.assertEqual((30, '30'), bst.ceiling(21))
+        self.assertEqual((40, '40'), bst.ceiling(40))
+        self.assertIsNone(bst.ceiling(41))
+
+    def test_range(self):
+        bst = self.TREE()
+        for i in range(0, 100, 5):
+            bst.insert(i, i)
+        self.assertListEqual([(i, i) for i in range(15, 45, 5)], list(bst.range(12, 45)))
+        self.assertListEqual([(i, i) for i in range(0, 100, 5)], list(bst.range(-1, 1000)))
+        self.assertListEqual([], list(bst.range(96, 1000)))
+        self.assertListEqual([], list(bst.range(21, 24)))
+
     def test_delete_non_existent(self):
-        bst = BinarySearchTree()
+        bst = self.TREE()
         bst.insert(1, 'B')
         bst.insert(0, 'A')
         bst.insert(2, 'C')
         self.assertRaises(Exception, bst.delete, 4)
         
     def test_find_exists(self):
-        bst = BinarySearchTree()
+        bst = self.TREE()
         bst.insert(1, 'B')
         bst.insert(0, 'A')
         bst.insert(2, 'C')
         self.assertEqual('C', bst.find(2))
 
     def test_find_non_existent(self):
-        bst = BinarySearchTree()
+        bst = self.TREE()
         bst.insert(1, 'B')
         bst.insert(0, 'A')
         bst.insert(2, 'C')
         self.assertIsNone(bst.find(3))
 
 
+class AVLTreeTest(BstTest):
+    TREE = AVLTree
+
+    def test_sorted_inserts_stay_balanced(self):
+        tree = AVLTree()
+        for i in range(1023):
+            self.assertTrue(tree.insert(i, i))
+        self.assertEqual(10, tree.height())
+        for i in range(0, 1023, 2):
+            tree.delete(i)
+        self.assertLessEqual(tree.height(), 10)
+        self.assertListEqual([(i, i) for i in range(1, 1023, 2)], list(tree))
+        self.assertEqual(511, tree.find(511))
+        self.assertIsNone(tree.find(510))
+
+
 if __name__ == "__main__":
     unittest.main()
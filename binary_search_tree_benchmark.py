@@ -0,0 +1,107 @@
+from __future__ import annotations
+from time import perf_counter
+from typing import Callable
+import argparse
+import random
+import tracemalloc
+import unittest
+
+from binary_search_tree import AVLTree, BinarySearchTree
+from sorted_list_map import SortedListMap
+
+
+def sorted_keys(n: int) -> list[int]:
+    return list(range(n))
+
+
+def random_keys(n: int, seed: int = 0) -> list[int]:
+    keys = list(range(n))
+    random.Random(seed).shuffle(keys)
+    return keys
+
+
+def zigzag_keys(n: int) -> list[int]:
+    """
+    0, n - 1, 1, n - 2, ...: every key is the new minimum or maximum of the remaining range, so an unbalanced tree becomes a zigzag path
+    """
+    keys: list[int] = []
+    lo, hi = 0, n - 1
+    while lo <= hi:
+        keys.append(lo)
+        if lo != hi:
+            keys.append(hi)
+        lo, hi = lo + 1, hi - 1
+    return keys
+
+
+KEY_ORDERS: dict[str, Callable[[int], list[int]]] = {
+    'sorted': sorted_keys,
+    'random': random_keys,
+    'zigzag': zigzag_keys,
+}
+
+TREES: dict[str, Callable[[], BinarySearchTree]] = {
+    'BinarySearchTree': BinarySearchTree,
+    'AVLTree': AVLTree,
+    'SortedListMap': SortedListMap,
+}
+
+
+def run(tree: BinarySearchTree, keys: list[int]) -> tuple[float, float, float]:
+    """
+    seconds taken to insert, find and delete all keys, in that order
+    """
+    start = perf_counter()
+    for key in keys:
+        tree.insert(key, key)
+    inserted = perf_counter()
+    for key in keys:
+        tree.find(key)
+    found = perf_counter()
+    for key in keys:
+        tree.delete(key)
+    deleted = perf_counter()
+    return inserted - start, found - inserted, deleted - found
+
+
+def bytes_per_key(factory: Callable[[], BinarySearchTree], keys: list[int]) -> float:
+    tracemalloc.start()
+    tree = factory()
+    for key in keys:
+        tree.insert(key, None)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(keys)
+
+
+def benchmark(n: int = 5000):
+    for order, make_keys in KEY_ORDERS.items():
+        keys = make_keys(n)
+        for name, factory in TREES.items():
+            insert, find, delete = run(factory(), keys)
+            print(f'{order:<8} {name:<18} insert {insert:.3f}s find {find:.3f}s delete {delete:.3f}s')
+
+    keys = random_keys(n)
+    for name, factory in TREES.items():
+        print(f'{name:<18} {bytes_per_key(factory, keys):.0f} bytes per key')
+    start = perf_counter()
+    SortedListMap.from_sorted((key, key) for key in range(n))
+    print(f'SortedListMap.from_sorted {perf_counter() - start:.3f}s')
+
+
+class BinarySearchTreeBenchmarkTest(unittest.TestCase):
+    def test_key_orders(self):
+        for make_keys in KEY_ORDERS.values():
+            self.assertListEqual(list(range(11)), sorted(make_keys(11)))
+
+    def test_run_empties_tree(self):
+        for factory in TREES.values():
+            tree = factory()
+            run(tree, zigzag_keys(50))
+            self.assertListEqual([], list(tree))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='time BinarySearchTree against AVLTree on several key orders')
+    parser.add_argument('-n', type=int, default=5000)
+    benchmark(parser.parse_args().n)
@@ -1,11 +1,30 @@
 from __future__ import annotations
+from collections.abc import Mapping
+from typing import Callable
+from weakref import WeakValueDictionary
+import math
 import operator
 import unittest
 
+try:
+    import numpy as np
+except ImportError:  # numpy is only used to test vectorized evaluation
+    np = None
+
 
 class Lit:
-    def __init__(self, num: int):
-        self.num = num
+    # hash-consing: structurally equal nodes are the same object, so identity doubles as structural equality
+    __interned: WeakValueDictionary[tuple[type, int, float], Lit] = WeakValueDictionary()
+
+    def __new__(cls, num: int) -> Lit:
+        # 0.0 == -0.0, but they print and divide differently, so the sign is part of the key
+        key = (type(num), num, math.copysign(1, num) if isinstance(num, float) else 1)
+        lit = Lit.__interned.get(key)
+        if lit is None:
+            lit = super().__new__(cls)
+            lit.num = num
+            Lit.__interned[key] = lit
+        return lit
 
     def add(self, lit: Lit) -> Expr:
         return Expr(self, '+', lit)
@@ -22,13 +41,32 @@ class Lit:
     def simplify(self) -> Lit:
         return self
 
+    def canonicalize(self) -> Lit:
+        return self
+
     def get_num(self) -> int:
         return self.num
 
+    def variables(self) -> list[str]:
+        return []
+
+    def compile(self) -> Callable[..., int]:
+        return generate(self)[0]
+
+    def evaluate(self, bindings: Mapping[str, object]) -> object:
+        return call_with(*generate(self), bindings)
+
 
 class Var:
-    def __init__(self, var: str):
-        self.var = var
+    __interned: WeakValueDictionary[str, Var] = WeakValueDictionary()
+
+    def __new__(cls, var: str) -> Var:
+        node = Var.__interned.get(var)
+        if node is None:
+            node = super().__new__(cls)
+            node.var = var
+            Var.__interned[var] = node
+        return node
 
     def add(self, varOrLit: Lit | Var) -> Expr:
         return Expr(self, '+', varOrLit)
@@ -39,12 +77,34 @@ class Var:
     def simplify(self) -> Var:
         return self
 
+    def canonicalize(self) -> Var:
+        return self
+
+    def variables(self) -> list[str]:
+        return [self.var]
+
+    def compile(self) -> Callable[..., int]:
+        return generate(self)[0]
+
+    def evaluate(self, bindings: Mapping[str, object]) -> object:
+        return call_with(*generate(self), bindings)
+
 
 class Expr:
-    def __init__(self, left: Lit | Var | Expr, operator: str, right: Lit | Var | Expr):
-        self.__left = left
-        self.__operator = operator
-        self.__right = right
+    # children are interned already, so keying on them compares by identity
+    __interned: WeakValueDictionary[tuple[Lit | Var | Expr, str, Lit | Var | Expr], Expr] = WeakValueDictionary()
+
+    def __new__(cls, left: Lit | Var | Expr, operator: str, right: Lit | Var | Expr) -> Expr:
+        expr = Expr.__interned.get((left, operator, right))
+        if expr is None:
+            expr = super().__new__(cls)
+            expr.__left = left
+            expr.__operator = operator
+            expr.__right = right
+            expr.__simplified = None
+            expr.__compiled = None
+            Expr.__interned[(left, operator, right)] = expr
+        return expr
 
     def add(self, expr: Lit | Var | Expr) -> Expr:
         return Expr(self, '+', expr)
@@ -56,9 +116,37 @@ class Expr:
         return Expr(self, '*', expr)
 
     def __repr__(self) -> str:
-        return f'({self.__left} {self.__operator} {self.__right})'
+        # an explicit stack of pending nodes and closing tokens, so left-deep chains of any length print without recursion
+        parts: list[str] = []
+        stack: list[str | Lit | Var | Expr] = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, Expr):
+                stack.extend((')', item.__right, f' {item.__operator} ', item.__left))
+                parts.append('(')
+            else:
+                parts.append(str(item))
+        return ''.join(parts)
 
     def simplify(self) -> Lit | Expr:
+        """
+        memoized on the node, so a subexpression shared n times is simplified once; returns self when nothing changes
+        """
+        if self.__simplified is None:
+            # simplify children before parents with an explicit stack, so __simplify only ever hits memoized children
+            stack: list[Expr] = [self]
+            while stack:
+                node = stack[-1]
+                pending = [child for child in (node.__right, node.__left) if isinstance(child, Expr) and child.__simplified is None]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                stack.pop()
+                if node.__simplified is None:
+                    node.__simplified = node.__simplify()
+        return self.__simplified
+
+    def __simplify(self) -> Lit | Expr:
         simplified_left = self.__left.simplify()
         simplified_right = self.__right.simplify()
 
@@ -72,12 +160,190 @@ class Expr:
             else:
                 raise Exception(f'unknown operator {self.__operator}')
 
+        if simplified_left is self.__left and simplified_right is self.__right:
+            return self
         return Expr(simplified_left, self.__operator, simplified_right)
 
     @staticmethod
     def __operate(left: Lit, operator: Callable[[int, int], int], right: Lit) -> Lit:
         return Lit(operator(left.get_num(), right.get_num()))
 
+    def canonicalize(self) -> Lit | Var | Expr:
+        """
+        an optional pass beyond simplify: flattens every associative + and * chain into its operands, folds all of their literals
+        into one trailing literal and rebuilds the chain left-deep, so ((x + 1) + 2) becomes (x + 3);
+        a subexpression shared by several parents is kept whole rather than flattened, so sharing survives the pass
+        """
+        parents = Expr.__count_parents(self)
+        done: dict[int, Lit | Var | Expr] = {}  # id of a node -> its canonical form
+        chains: dict[int, list[Lit | Var | Expr]] = {}  # id of a + or * node -> the operands of its flattened chain
+        stack: list[Lit | Var | Expr] = [self]
+        while stack:
+            node = stack[-1]
+            if id(node) in done:
+                stack.pop()
+                continue
+            if not isinstance(node, Expr):
+                done[id(node)] = node
+                stack.pop()
+                continue
+
+            if node.__operator in ('+', '*'):
+                if id(node) not in chains:
+                    chains[id(node)] = Expr.__chain_operands(node, parents)
+                operands = chains[id(node)]
+            else:
+                operands = [node.__left, node.__right]
+            pending = [operand for operand in reversed(operands) if id(operand) not in done]
+            if pending:
+                stack.extend(pending)
+                continue
+
+            stack.pop()
+            operands = [done[id(operand)] for operand in operands]
+            if node.__operator in ('+', '*'):
+                done[id(node)] = Expr.__fold_chain(node.__operator, operands)
+            elif node.__operator == '-':
+                left, right = operands
+                done[id(node)] = Expr.__operate(left, operator.sub, right) if isinstance(left, Lit) and isinstance(right, Lit) else Expr(left, '-', right)
+            else:
+                raise Exception(f'unknown operator {node.__operator}')
+        return done[id(self)]
+
+    @staticmethod
+    def __count_parents(root: Expr) -> dict[int, int]:
+        parents: dict[int, int] = {}
+        seen: set[int] = set()
+        stack: list[Expr] = [root]
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            for child in (node.__left, node.__right):
+                parents[id(child)] = parents.get(id(child), 0) + 1
+                if isinstance(child, Expr):
+                    stack.append(child)
+        return parents
+
+    @staticmethod
+    def __chain_operands(node: Expr, parents: dict[int, int]) -> list[Lit | Var | Expr]:
+        """
+        the operands of the chain of node's operator rooted at node, left to right, descending only into unshared children
+        """
+        operands: list[Lit | Var | Expr] = []
+        stack: list[Lit | Var | Expr] = [node.__right, node.__left]
+        while stack:
+            child = stack.pop()
+            if isinstance(child, Expr) and child.__operator == node.__operator and parents[id(child)] == 1:
+                stack.append(child.__right)
+                stack.append(child.__left)
+            else:
+                operands.append(child)
+        return operands
+
+    @staticmethod
+    def __fold_chain(op: str, operands: list[Lit | Var | Expr]) -> Lit | Var | Expr:
+        fold, identity = (operator.add, 0) if op == '+' else (operator.mul, 1)
+        constant = identity
+        terms: list[Lit | Var | Expr] = []
+        for operand in operands:
+            if isinstance(operand, Lit):
+                constant = fold(constant, operand.get_num())
+            else:
+                terms.append(operand)
+        if constant != identity or not terms:
+            terms.append(Lit(constant))
+
+        result = terms[0]
+        for term in terms[1:]:
+            result = Expr(result, op, term)
+        return result
+
+    def variables(self) -> list[str]:
+        """
+        sorted names of all variables in the expression
+        """
+        names: set[str] = set()
+        seen: set[int] = set()
+        stack: list[Lit | Var | Expr] = [self]
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            if isinstance(node, Var):
+                names.add(node.var)
+            elif isinstance(node, Expr):
+                stack.append(node.__left)
+                stack.append(node.__right)
+        return sorted(names)
+
+    def get_parts(self) -> tuple[Lit | Var | Expr, str, Lit | Var | Expr]:
+        return self.__left, self.__operator, self.__right
+
+    def compile(self) -> Callable[..., int]:
+        """
+        turns the expression into a generated Python function taking one positional argument per name in variables();
+        every distinct node becomes one assignment, so shared subexpressions are computed once per call
+        """
+        if self.__compiled is None:
+            self.__compiled = generate(self)
+        return self.__compiled[0]
+
+    def evaluate(self, bindings: Mapping[str, object]) -> object:
+        """
+        evaluates the compiled expression; binding every variable to a numpy.ndarray evaluates all rows in one call
+        """
+        self.compile()
+        return call_with(*self.__compiled, bindings)
+
+
+def generate(root: Lit | Var | Expr) -> tuple[Callable[..., int], list[str]]:
+    """
+    the compiled function of root along with the variable names its positional arguments stand for
+    """
+    variables = root.variables()
+    params = {name: f'_v{idx}' for idx, name in enumerate(variables)}
+    # literals are passed in as globals rather than printed into the source, since repr(float('inf')) is no valid Python
+    namespace: dict[str, object] = {}
+    names: dict[int, str] = {}  # id of a node -> the Python expression holding its value
+    lines: list[str] = []
+    stack: list[tuple[Lit | Var | Expr, bool]] = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if id(node) in names:
+            continue
+        if isinstance(node, Lit):
+            names[id(node)] = f'_c{len(namespace)}'
+            namespace[names[id(node)]] = node.get_num()
+        elif isinstance(node, Var):
+            names[id(node)] = params[node.var]
+        elif not children_done:
+            left, _, right = node.get_parts()
+            stack.append((node, True))
+            stack.append((right, False))
+            stack.append((left, False))
+        else:
+            left, op, right = node.get_parts()
+            if op not in ('+', '-', '*'):
+                raise Exception(f'unknown operator {op}')
+            names[id(node)] = f'_t{len(lines)}'
+            lines.append(f'    _t{len(lines)} = {names[id(left)]} {op} {names[id(right)]}')
+
+    source = f'def _compiled({", ".join(params.values())}):\n' + ''.join(line + '\n' for line in lines) + f'    return {names[id(root)]}\n'
+    exec(source, namespace)
+    return namespace['_compiled'], variables
+
+
+def call_with(compiled: Callable[..., int], variables: list[str], bindings: Mapping[str, object]) -> object:
+    args = []
+    for name in variables:
+        if name not in bindings:
+            raise Exception(f'unbound variable {name}')
+        args.append(bindings[name])
+    return compiled(*args)
+
 
 class TestingCalc(unittest.TestCase):
     def eq(self, e, before, after):
@@ -111,6 +377,90 @@ class TestingCalc(unittest.TestCase):
         self.eq(Var("x").add(Lit(1)).add(Lit(2)),
                 "((x + 1) + 2)", "((x + 1) + 2)")
 
+    def testHashConsing(self):
+        self.assertIs(Lit(1), Lit(1))
+        self.assertIsNot(Lit(1), Lit(1.0))
+        self.assertIsNot(Lit(0.0), Lit(-0.0))
+        self.assertEqual('-0.0', repr(Lit(-0.0)))
+        self.assertIs(Lit(-0.0), Lit(-0.0))
+        self.assertIs(Var("x"), Var("x"))
+        self.assertIs(Var("x").add(Lit(1)), Var("x").add(Lit(1)))
+        self.assertIsNot(Var("x").add(Lit(1)), Var("x").add(Lit(2)))
+
+    def testSimplifyReturnsUnchangedNodes(self):
+        e = Var("x").add(Lit(1)).add(Lit(2))
+        self.assertIs(e, e.simplify())
+        e = Var("x").add(Lit(1).add(Lit(2)))
+        self.assertIs(Var("x").add(Lit(3)), e.simplify())
+
+    def testDeepSharedGraph(self):
+        e = Var("x")
+        for _ in range(200):
+            e = e.add(e)
+        self.assertIs(e, e.simplify())
+        e = Lit(1)
+        for _ in range(200):
+            e = e.mul(e)
+        self.assertIs(Lit(1), e.simplify())
+
+    def testCanonicalize(self):
+        x, y = Var("x"), Var("y")
+        self.assertIs(x.add(Lit(3)), x.add(Lit(1)).add(Lit(2)).canonicalize())
+        self.assertEqual("((x + y) + 6)", str(Lit(1).add(x).add(Lit(2).add(y.add(Lit(3)))).canonicalize()))
+        self.assertEqual("(x * 6)", str(Lit(2).mul(x).mul(Lit(3)).canonicalize()))
+        self.assertIs(x, x.add(Lit(1)).add(Lit(-1)).canonicalize())
+        self.assertIs(Lit(5), Lit(2).add(Lit(3)).canonicalize())
+        self.assertEqual("((x + 3) - (y + 1))", str(x.add(Lit(1)).add(Lit(2)).sub(y.add(Lit(1))).canonicalize()))
+        self.assertEqual("((x * 2) + 5)", str(Lit(2).mul(x).add(Lit(2).sub(Lit(1))).add(Lit(4)).canonicalize()))
+
+    def testCanonicalizeKeepsSharing(self):
+        e = Var("x")
+        for _ in range(200):
+            e = e.add(e).add(Lit(1))
+        canonical = e.canonicalize()
+        self.assertEqual(e.evaluate({"x": 3}), canonical.evaluate({"x": 3}))
+
+    def testLongChains(self):
+        n = 50_000
+        e = Lit(0)
+        for i in range(1, n):
+            e = e.add(Lit(i))
+        self.assertEqual(n * (n - 1) // 2, e.simplify().get_num())
+        self.assertTrue(str(e).startswith("(" * (n - 1) + "0 + 1) + 2)"))
+        e = Var("x")
+        for i in range(n):
+            e = e.add(Lit(1))
+        self.assertIs(e, e.simplify())
+        self.assertIs(Var("x").add(Lit(n)), e.canonicalize())
+
+    def testCompile(self):
+        e = Var("x").add(Lit(1)).mul(Var("y").add(Lit(-2))).sub(Var("x"))
+        self.assertListEqual(["x", "y"], e.variables())
+        f = e.compile()
+        self.assertIs(f, e.compile())
+        for x in range(-3, 4):
+            for y in range(-3, 4):
+                self.assertEqual((x + 1) * (y - 2) - x, f(x, y))
+                self.assertEqual((x + 1) * (y - 2) - x, e.evaluate({"x": x, "y": y, "z": 0}))
+        self.assertEqual(5, Lit(5).compile()())
+        self.assertEqual(7, Var("x").evaluate({"x": 7}))
+        self.assertRaises(Exception, e.evaluate, {"x": 1})
+        self.assertEqual(float('inf'), Var("x").add(Lit(float('inf'))).evaluate({"x": 1}))
+        nan = Lit(float('nan')).mul(Var("x")).evaluate({"x": 2})
+        self.assertNotEqual(nan, nan)
+
+    def testCompileSharedGraph(self):
+        e = Var("x")
+        for _ in range(200):
+            e = e.add(e)
+        self.assertEqual(3 * 2 ** 200, e.evaluate({"x": 3}))
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def testEvaluateVectorized(self):
+        e = Expr(Var("x"), '*', Var("x")).add(Lit(3).mul(Var("y"))).sub(Lit(1))
+        x, y = np.arange(1000), np.arange(1000, 2000)
+        self.assertListEqual((x * x + 3 * y - 1).tolist(), e.evaluate({"x": x, "y": y}).tolist())
+
 
 if __name__ == '__main__':
     unittest.main()
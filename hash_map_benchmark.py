@@ -0,0 +1,213 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from functools import partial
+from itertools import accumulate
+from time import perf_counter
+from typing import Callable
+import argparse
+import bisect
+import random
+import tracemalloc
+import unittest
+
+from open_addressing_hash_map import ResizableOpenAddressingHashST
+from separate_chaining_hash_map import SeparateChainingHashST
+
+SET = 'set'
+GET = 'get'
+DEL = 'del'
+
+Op = tuple[str, object]
+
+
+def uniform_workload(n: int, lookups: int, seed: int = 0) -> list[Op]:
+    rnd = random.Random(seed)
+    return [(SET, i) for i in range(n)] + [(GET, rnd.randrange(n * 2)) for _ in range(lookups)]
+
+
+def zipfian_workload(n: int, lookups: int, s: float = 1.1, seed: int = 0) -> list[Op]:
+    rnd = random.Random(seed)
+    cum_weights = list(accumulate(1 / (rank + 1) ** s for rank in range(n)))
+    # a random rank-to-key mapping, so hot keys are not also the smallest ones
+    keys = list(range(n))
+    rnd.shuffle(keys)
+    return [(SET, i) for i in range(n)] + [(GET, keys[bisect.bisect(cum_weights, rnd.random() * cum_weights[-1])]) for _ in range(lookups)]
+
+
+def adversarial_workload(n: int, lookups: int, seed: int = 0) -> list[Op]:
+    """
+    hash(i) == i for ints, so multiples of 2 ** 20 share every low bit and land in the same bucket of any table smaller than that
+    """
+    rnd = random.Random(seed)
+    return [(SET, i << 20) for i in range(n)] + [(GET, rnd.randrange(n) << 20) for _ in range(lookups)]
+
+
+def churn_workload(n: int, rounds: int, seed: int = 0) -> list[Op]:
+    """
+    keeps n live keys while repeatedly inserting a new key, deleting the oldest one and looking up a random live one
+    """
+    rnd = random.Random(seed)
+    ops: list[Op] = [(SET, i) for i in range(n)]
+    for i in range(n, n + rounds):
+        ops.append((SET, i))
+        ops.append((DEL, i - n))
+        ops.append((GET, rnd.randrange(i - n + 1, i + 1)))
+    return ops
+
+
+WORKLOADS: dict[str, Callable[[int, int], list[Op]]] = {
+    'uniform': uniform_workload,
+    'zipfian': zipfian_workload,
+    'adversarial': adversarial_workload,
+    'churn': churn_workload,
+}
+
+# every factory takes the number of distinct keys the workload inserts; separate chaining never rehashes, so it gets one bucket per key,
+# while dict and open addressing start small and grow, since resizing is part of what they are measured on
+IMPLEMENTATIONS: dict[str, Callable[[int], object]] = {
+    'dict': lambda n: {},
+    'SeparateChainingHashST': SeparateChainingHashST,
+    'ResizableOpenAddressingHashST': lambda n: ResizableOpenAddressingHashST(),
+}
+
+
+def run(st, ops: list[Op]) -> list[object]:
+    """
+    applies ops to st and returns the results of the lookups
+    """
+    results = []
+    get = st.get
+    for op, key in ops:
+        if op == GET:
+            results.append(get(key))
+        elif op == SET:
+            st[key] = key
+        else:
+            del st[key]
+    return results
+
+
+class CountingKey:
+    """
+    the profiling hook: wraps a key and counts every equality check the table makes against it
+    """
+    comparisons = 0
+
+    def __init__(self, key: object):
+        self.key = key
+        self.hash = hash(key)
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        CountingKey.comparisons += 1
+        return isinstance(other, CountingKey) and self.key == other.key
+
+    def __ne__(self, other: object) -> bool:
+        return not self == other
+
+
+def count_comparisons(factory: Callable[[], object], ops: list[Op]) -> list[int]:
+    """
+    key comparisons made by every op; for a GET that is the probe length of open addressing or the chain length walked by separate chaining,
+    while a SET also pays for any rehash it triggers, so only GET counts measure probe lengths
+    """
+    st = factory()
+    counts: list[int] = []
+    for op, key in ops:
+        before = CountingKey.comparisons
+        run(st, [(op, CountingKey(key))])
+        counts.append(CountingKey.comparisons - before)
+    return counts
+
+
+@dataclass
+class BenchmarkResult:
+    workload: str
+    implementation: str
+    ops_per_sec: float
+    peak_memory: int
+    avg_probe: float  # key comparisons per lookup
+    max_probe: int
+    update_comparisons: float  # key comparisons per insert or delete, including the rehashes they trigger
+
+    def __repr__(self):
+        return f'{self.workload:<12} {self.implementation:<30} {self.ops_per_sec:>12.0f} ops/s {self.peak_memory / 1024:>10.0f} KiB ' \
+            f'{self.avg_probe:>8.2f} avg probe {self.max_probe:>6} max probe {self.update_comparisons:>10.2f} cmp/update'
+
+
+def benchmark(workload: str, implementation: str, ops: list[Op]) -> BenchmarkResult:
+    """
+    timing, memory tracing and comparison counting each get their own pass, so the hooks never distort the timing
+    """
+    keys = len({key for op, key in ops if op == SET})
+    factory = partial(IMPLEMENTATIONS[implementation], keys)
+    start = perf_counter()
+    run(factory(), ops)
+    elapsed = perf_counter() - start
+
+    # lookups allocate nothing that stays, and tracing them only slows the pass down
+    updates = [(op, key) for op, key in ops if op != GET]
+    tracemalloc.start()
+    st = factory()
+    run(st, updates)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    lookup_counts: list[int] = []
+    update_counts: list[int] = []
+    for (op, _), count in zip(ops, count_comparisons(factory, ops)):
+        (lookup_counts if op == GET else update_counts).append(count)
+    return BenchmarkResult(workload, implementation, len(ops) / elapsed, peak,
+                           sum(lookup_counts) / len(lookup_counts) if lookup_counts else 0.0, max(lookup_counts, default=0),
+                           sum(update_counts) / len(update_counts) if update_counts else 0.0)
+
+
+# every insert of the adversarial workload probes all earlier keys, so it is quadratic and runs at a smaller n
+QUADRATIC_WORKLOADS = {'adversarial'}
+
+
+def benchmark_all(n: int = 5000, lookups: int = 5000, quadratic_n: int = 500) -> list[BenchmarkResult]:
+    results = []
+    for workload, make_ops in WORKLOADS.items():
+        size = min(n, quadratic_n) if workload in QUADRATIC_WORKLOADS else n
+        ops = make_ops(size, min(lookups, size) if workload in QUADRATIC_WORKLOADS else lookups)
+        for implementation in IMPLEMENTATIONS:
+            results.append(benchmark(workload, implementation, ops))
+            print(results[-1])
+    return results
+
+
+class HashMapBenchmarkTest(unittest.TestCase):
+    def test_implementations_agree(self):
+        for workload, make_ops in WORKLOADS.items():
+            ops = make_ops(200, 200)
+            expected = run(dict(), ops)
+            for implementation, factory in IMPLEMENTATIONS.items():
+                self.assertListEqual(expected, run(factory(200), ops), f'{implementation} on {workload}')
+
+    def test_count_comparisons(self):
+        ops = adversarial_workload(10, 0)
+        self.assertListEqual(list(range(10)), count_comparisons(SeparateChainingHashST, ops))
+
+    def test_benchmark(self):
+        result = benchmark('uniform', 'dict', uniform_workload(10, 10))
+        self.assertGreater(result.ops_per_sec, 0)
+        self.assertGreater(result.peak_memory, 0)
+
+    def test_probe_excludes_rehash(self):
+        ops = adversarial_workload(100, 100)
+        result = benchmark('adversarial', 'ResizableOpenAddressingHashST', ops)
+        # a lookup probes at most every key, however much rehashing the inserts did
+        self.assertLessEqual(result.max_probe, 100)
+        self.assertGreater(result.update_comparisons, result.avg_probe / 2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='compare the hash maps on every workload')
+    parser.add_argument('-n', type=int, default=5000)
+    parser.add_argument('--lookups', type=int, default=5000)
+    parser.add_argument('--quadratic-n', type=int, default=500, help='n for workloads that are quadratic by design')
+    args = parser.parse_args()
+    benchmark_all(args.n, args.lookups, args.quadratic_n)
@@ -1,4 +1,6 @@
 from __future__ import annotations
+from array import array
+from collections.abc import Iterable
 from dataclasses import dataclass
 import unittest
 
@@ -13,56 +15,90 @@ class Node:
 
 
 class IndexedMinHeap:
-    def __init__(self, *args):
+    ARITY = 4
+
+    def __init__(self, arity: int = ARITY):
+        """
+        arity is the number of children per node; a wider heap has fewer levels to swim through
+        """
+        if arity < 2:
+            raise Exception('arity must be at least 2')
+        self.__arity: int = arity
         self.__lst: list[Node] = []  # store scores
         self.__key_to_index_map: dict[object, int] = {}
 
+    @classmethod
+    def heapify(cls, pairs: Iterable[tuple[object, int]], arity: int = ARITY) -> IndexedMinHeap:
+        """
+        builds the heap from (key, score) pairs in O(n) by sinking every parent bottom-up, instead of n inserts
+        """
+        heap = cls(arity)
+        heap.__lst = [Node(key, score) for key, score in pairs]
+        heap.__key_to_index_map = {node.key: idx for idx, node in enumerate(heap.__lst)}
+        if len(heap.__key_to_index_map) != len(heap.__lst):
+            raise Exception('key exists')
+        for idx in range((len(heap.__lst) - 2) // arity, -1, -1):
+            heap.__sink(idx)
+        return heap
+
     def __swim(self, idx: int):
+        # move the node once into its final hole instead of swapping at every level
+        lst, key_to_index_map, arity = self.__lst, self.__key_to_index_map, self.__arity
+        node = lst[idx]
+        score = node.score
         while idx > 0:
-            parent = (idx - 1) // 2
-            if self.__lst[idx] < self.__lst[parent]:
-                self.__swap(idx, parent)
+            parent = (idx - 1) // arity
+            parent_node = lst[parent]
+            if score < parent_node.score:
+                lst[idx] = parent_node
+                key_to_index_map[parent_node.key] = idx
+                idx = parent
             else:
                 break
-            idx = parent
-
-    def __update_key_to_index_map(self, idx: int):
-        self.__key_to_index_map[self.__lst[idx].key] = idx
-
-    def __swap(self, idx_0: int, idx_1: int):
-        self.__lst[idx_0], self.__lst[idx_1] = self.__lst[idx_1], self.__lst[idx_0]
-        self.__update_key_to_index_map(idx_0)
-        self.__update_key_to_index_map(idx_1)
+        lst[idx] = node
+        key_to_index_map[node.key] = idx
 
     def __sink(self, idx: int):
-        while idx * 2 + 1 < len(self.__lst):
-            child = idx * 2 + 1 if idx * 2 + \
-                2 == len(self.__lst) or self.__lst[idx * 2 + 1] < self.__lst[idx * 2 + 2] else idx * 2 + 2
-            if self.__lst[idx] > self.__lst[child]:
-                self.__swap(idx, child)
+        lst, key_to_index_map, arity = self.__lst, self.__key_to_index_map, self.__arity
+        node = lst[idx]
+        score = node.score
+        size = len(lst)
+        while True:
+            first_child = idx * arity + 1
+            if first_child >= size:
+                break
+            child, child_score = first_child, lst[first_child].score
+            for sibling in range(first_child + 1, min(first_child + arity, size)):
+                if lst[sibling].score < child_score:
+                    child, child_score = sibling, lst[sibling].score
+            if child_score < score:
+                lst[idx] = lst[child]
+                key_to_index_map[lst[idx].key] = idx
+                idx = child
             else:
                 break
-            idx = child
+        lst[idx] = node
+        key_to_index_map[node.key] = idx
 
     def insert(self, key: object, score: int):
         if key in self.__key_to_index_map:
             raise Exception('key exists')
 
         self.__lst.append(Node(key, score))
-        self.__key_to_index_map[key] = len(self.__lst) - 1
         self.__swim(len(self.__lst) - 1)
 
     def pop(self) -> Node:
         if not self.__lst:
             raise Exception('heap is empty')
-        if len(self.__lst) == 1:
-            result = self.__lst.pop()
-            del self.__key_to_index_map[result.key]
-            return result
 
-        self.__swap(0, len(self.__lst) - 1)
-        result = self.__lst.pop()
+        last = self.__lst.pop()
+        if not self.__lst:
+            del self.__key_to_index_map[last.key]
+            return last
+
+        result = self.__lst[0]
         del self.__key_to_index_map[result.key]
+        self.__lst[0] = last
         self.__sink(0)
         return result
 
@@ -71,14 +107,373 @@ class IndexedMinHeap:
             raise Exception('key does not exist')
 
         idx = self.__key_to_index_map[key]
+        node = self.__lst[idx]
+        old_score, node.score = node.score, score
+        if score < old_score:
+            self.__swim(idx)
+        else:
+            self.__sink(idx)
+
+    def decrease_key(self, key: object, score: int):
+        """
+        the Dijkstra fast path: only swims, as score must not be larger than the current one
+        """
+        if key not in self.__key_to_index_map:
+            raise Exception('key does not exist')
+
+        idx = self.__key_to_index_map[key]
+        if self.__lst[idx].score < score:
+            raise Exception('score is larger than the current one')
         self.__lst[idx].score = score
-        self.__sink(idx)
         self.__swim(idx)
 
+    def increase_key(self, key: object, score: int):
+        """
+        only sinks, as score must not be smaller than the current one
+        """
+        if key not in self.__key_to_index_map:
+            raise Exception('key does not exist')
+
+        idx = self.__key_to_index_map[key]
+        if score < self.__lst[idx].score:
+            raise Exception('score is smaller than the current one')
+        self.__lst[idx].score = score
+        self.__sink(idx)
+
+    def peek(self) -> Node:
+        if not self.__lst:
+            raise Exception('heap is empty')
+        return self.__lst[0]
+
+    def remove(self, key: object) -> Node:
+        if key not in self.__key_to_index_map:
+            raise Exception('key does not exist')
+
+        idx = self.__key_to_index_map.pop(key)
+        result = self.__lst[idx]
+        last = self.__lst.pop()
+        if idx < len(self.__lst):
+            self.__lst[idx] = last
+            if last.score < result.score:
+                self.__swim(idx)
+            else:
+                self.__sink(idx)
+        return result
+
+    def pop_many(self, k: int) -> list[Node]:
+        """
+        pops the min(k, len(self)) smallest nodes in order
+        """
+        return [self.pop() for _ in range(min(k, len(self.__lst)))]
+
+    def pop_while(self, max_score: int) -> list[Node]:
+        """
+        pops every node whose score is not larger than max_score, in order
+        """
+        result: list[Node] = []
+        while self.__lst and self.__lst[0].score <= max_score:
+            result.append(self.pop())
+        return result
+
+    def __len__(self) -> int:
+        return len(self.__lst)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__key_to_index_map
+
     def __iter__(self):
         return iter(self.__lst)
 
 
+class ArrayIndexedMinHeap:
+    """
+    IndexedMinHeap for the dense integer keys 0..n-1, kept as parallel arrays instead of Node objects and a dict:
+    heap[i] is the key at position i, pos[key] is the position of key (-1 when absent), and scores[key] is its score
+    """
+    ARITY = 4
+
+    def __init__(self, n: int, arity: int = ARITY, typecode: str = 'q'):
+        """
+        typecode is the array module typecode of the scores, e.g., 'q' for integers or 'd' for floats
+        """
+        if arity < 2:
+            raise Exception('arity must be at least 2')
+        if n >= 1 << 31:
+            raise Exception('too many keys')
+        self.__arity: int = arity
+        self.__size: int = 0
+        self.__heap: array = array('i', [0]) * n
+        self.__pos: array = array('i', [-1]) * n
+        self.__scores: array = array(typecode, [0]) * n
+
+    def __swim(self, idx: int):
+        heap, pos, scores, arity = self.__heap, self.__pos, self.__scores, self.__arity
+        key = heap[idx]
+        score = scores[key]
+        while idx > 0:
+            parent = (idx - 1) // arity
+            parent_key = heap[parent]
+            if score < scores[parent_key]:
+                heap[idx] = parent_key
+                pos[parent_key] = idx
+                idx = parent
+            else:
+                break
+        heap[idx] = key
+        pos[key] = idx
+
+    def __sink(self, idx: int):
+        heap, pos, scores, arity, size = self.__heap, self.__pos, self.__scores, self.__arity, self.__size
+        key = heap[idx]
+        score = scores[key]
+        while True:
+            first_child = idx * arity + 1
+            if first_child >= size:
+                break
+            child, child_key = first_child, heap[first_child]
+            child_score = scores[child_key]
+            for sibling in range(first_child + 1, min(first_child + arity, size)):
+                sibling_key = heap[sibling]
+                if scores[sibling_key] < child_score:
+                    child, child_key, child_score = sibling, sibling_key, scores[sibling_key]
+            if child_score < score:
+                heap[idx] = child_key
+                pos[child_key] = idx
+                idx = child
+            else:
+                break
+        heap[idx] = key
+        pos[key] = idx
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def __contains__(self, key: int) -> bool:
+        return 0 <= key < len(self.__pos) and self.__pos[key] != -1
+
+    def __check(self, key: int):
+        # a negative key would silently index the arrays from the end
+        if key < 0 or key >= len(self.__pos):
+            raise Exception(f'key {key} is out of range')
+
+    def insert(self, key: int, score: int):
+        self.__check(key)
+        if self.__pos[key] != -1:
+            raise Exception('key exists')
+
+        self.__scores[key] = score
+        self.__heap[self.__size] = key
+        self.__size += 1
+        self.__swim(self.__size - 1)
+
+    def pop(self) -> Node:
+        if not self.__size:
+            raise Exception('heap is empty')
+
+        key = self.__heap[0]
+        self.__size -= 1
+        self.__pos[key] = -1
+        if self.__size:
+            self.__heap[0] = self.__heap[self.__size]
+            self.__sink(0)
+        return Node(key, self.__scores[key])
+
+    def update(self, key: int, score: int):
+        self.__check(key)
+        if self.__pos[key] == -1:
+            raise Exception('key does not exist')
+
+        old_score = self.__scores[key]
+        self.__scores[key] = score
+        if score < old_score:
+            self.__swim(self.__pos[key])
+        else:
+            self.__sink(self.__pos[key])
+
+    def decrease_key(self, key: int, score: int):
+        self.__check(key)
+        if self.__pos[key] == -1:
+            raise Exception('key does not exist')
+        if self.__scores[key] < score:
+            raise Exception('score is larger than the current one')
+
+        self.__scores[key] = score
+        self.__swim(self.__pos[key])
+
+    def increase_key(self, key: int, score: int):
+        self.__check(key)
+        if self.__pos[key] == -1:
+            raise Exception('key does not exist')
+        if score < self.__scores[key]:
+            raise Exception('score is smaller than the current one')
+
+        self.__scores[key] = score
+        self.__sink(self.__pos[key])
+
+    def __iter__(self):
+        return (Node(self.__heap[idx], self.__scores[self.__heap[idx]]) for idx in range(self.__size))
+
+
+@dataclass(eq=False)
+class PairingNode:
+    key: object
+    score: int
+    child: PairingNode = None
+    next: PairingNode = None  # the next sibling
+    prev: PairingNode = None  # the previous sibling, or the parent for the first child
+
+
+class PairingIndexedMinHeap:
+    """
+    a pairing heap behind the IndexedMinHeap interface: insert and decrease_key are O(1) and pop is O(log n) amortized,
+    which suits workloads dominated by insert and decrease_key with rare pops
+    """
+
+    def __init__(self):
+        self.__root: PairingNode = None
+        self.__key_to_node_map: dict[object, PairingNode] = {}
+
+    @staticmethod
+    def __meld(a: PairingNode, b: PairingNode) -> PairingNode:
+        """
+        links two detached roots, the larger one becomes the first child of the smaller one
+        """
+        if b.score < a.score:
+            a, b = b, a
+        b.prev = a
+        b.next = a.child
+        if a.child:
+            a.child.prev = b
+        a.child = b
+        return a
+
+    @staticmethod
+    def __merge_pairs(first: PairingNode) -> PairingNode:
+        """
+        the two-pass combine of a sibling list: meld pairs left to right, then fold the results right to left
+        """
+        pairs: list[PairingNode] = []
+        while first:
+            a, b = first, first.next
+            first = b.next if b else None
+            a.next = a.prev = None
+            if b:
+                b.next = b.prev = None
+                a = PairingIndexedMinHeap.__meld(a, b)
+            pairs.append(a)
+
+        result = pairs.pop() if pairs else None
+        while pairs:
+            result = PairingIndexedMinHeap.__meld(pairs.pop(), result)
+        return result
+
+    def __detach(self, node: PairingNode):
+        if node.prev.child is node:
+            node.prev.child = node.next
+        else:
+            node.prev.next = node.next
+        if node.next:
+            node.next.prev = node.prev
+        node.next = node.prev = None
+
+    def __meld_into_root(self, node: PairingNode):
+        self.__root = PairingIndexedMinHeap.__meld(self.__root, node) if self.__root else node
+
+    def insert(self, key: object, score: int):
+        if key in self.__key_to_node_map:
+            raise Exception('key exists')
+
+        node = PairingNode(key, score)
+        self.__key_to_node_map[key] = node
+        self.__meld_into_root(node)
+
+    def pop(self) -> Node:
+        if not self.__root:
+            raise Exception('heap is empty')
+
+        root = self.__root
+        del self.__key_to_node_map[root.key]
+        self.__root = PairingIndexedMinHeap.__merge_pairs(root.child)
+        return Node(root.key, root.score)
+
+    def peek(self) -> Node:
+        if not self.__root:
+            raise Exception('heap is empty')
+        return Node(self.__root.key, self.__root.score)
+
+    def __cut(self, node: PairingNode):
+        """
+        takes node out of the heap, keeping its children in the heap
+        """
+        if node is self.__root:
+            self.__root = PairingIndexedMinHeap.__merge_pairs(node.child)
+        else:
+            self.__detach(node)
+            if node.child:
+                self.__meld_into_root(PairingIndexedMinHeap.__merge_pairs(node.child))
+        node.child = None
+
+    def decrease_key(self, key: object, score: int):
+        if key not in self.__key_to_node_map:
+            raise Exception('key does not exist')
+
+        node = self.__key_to_node_map[key]
+        if node.score < score:
+            raise Exception('score is larger than the current one')
+        node.score = score
+        if node is not self.__root:
+            # the subtree of node stays heap-ordered, so it moves to the root as a whole
+            self.__detach(node)
+            self.__root = PairingIndexedMinHeap.__meld(self.__root, node)
+
+    def increase_key(self, key: object, score: int):
+        if key not in self.__key_to_node_map:
+            raise Exception('key does not exist')
+
+        node = self.__key_to_node_map[key]
+        if score < node.score:
+            raise Exception('score is smaller than the current one')
+        self.__cut(node)
+        node.score = score
+        self.__meld_into_root(node)
+
+    def update(self, key: object, score: int):
+        if key not in self.__key_to_node_map:
+            raise Exception('key does not exist')
+
+        if score < self.__key_to_node_map[key].score:
+            self.decrease_key(key, score)
+        else:
+            self.increase_key(key, score)
+
+    def remove(self, key: object) -> Node:
+        if key not in self.__key_to_node_map:
+            raise Exception('key does not exist')
+
+        node = self.__key_to_node_map.pop(key)
+        self.__cut(node)
+        return Node(node.key, node.score)
+
+    def __len__(self) -> int:
+        return len(self.__key_to_node_map)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__key_to_node_map
+
+    def __iter__(self):
+        """
+        the root comes first; the rest follows in no particular order
+        """
+        stack = [self.__root] if self.__root else []
+        while stack:
+            node = stack.pop()
+            yield Node(node.key, node.score)
+            if node.next:
+                stack.append(node.next)
+            if node.child:
+                stack.append(node.child)
+
+
 class IndexedMinHeapTest(unittest.TestCase):
     def test_insert_duplicate(self):
         heap = IndexedMinHeap()
@@ -116,13 +511,159 @@ class IndexedMinHeapTest(unittest.TestCase):
         self.assertEqual(Node('B', 2), heap.pop())
 
     def test_iter(self):
-        heap = IndexedMinHeap()
+        heap = IndexedMinHeap(2)
         for i in range(5):
             heap.insert(chr(i + 65), 100 - i)
 
         self.assertListEqual([Node('E', 96), Node('D', 97), Node(
             'B', 99), Node('A', 100), Node('C', 98)], list(iter(heap)))
 
+    def test_iter_4_ary(self):
+        heap = IndexedMinHeap()
+        for i in range(6):
+            heap.insert(chr(i + 65), 100 - i)
+
+        self.assertListEqual([Node('F', 95), Node('E', 96), Node('B', 99), Node(
+            'C', 98), Node('D', 97), Node('A', 100)], list(iter(heap)))
+
+    def test_decrease_and_increase_key(self):
+        heap = IndexedMinHeap()
+        for i in range(20):
+            heap.insert(i, i * 10)
+        heap.decrease_key(15, -1)
+        heap.increase_key(0, 1000)
+        self.assertRaises(Exception, heap.decrease_key, 1, 11)
+        self.assertRaises(Exception, heap.increase_key, 1, 9)
+        self.assertRaises(Exception, heap.decrease_key, 'XXX', 0)
+        self.assertListEqual([15] + [i for i in range(1, 20) if i != 15] + [0], [heap.pop().key for _ in range(20)])
+
+    def test_arity(self):
+        for arity in range(2, 6):
+            heap = IndexedMinHeap(arity)
+            scores = [(i * 7919) % 101 for i in range(101)]
+            for key, score in enumerate(scores):
+                heap.insert(key, score)
+            for key in range(0, 101, 3):
+                scores[key] = (scores[key] * 31) % 97
+                heap.update(key, scores[key])
+            self.assertListEqual(sorted(scores), [heap.pop().score for _ in range(101)])
+
+    def test_heapify(self):
+        for arity in range(2, 6):
+            pairs = [(key, (key * 7919) % 101) for key in range(101)]
+            heap = IndexedMinHeap.heapify(pairs, arity)
+            self.assertEqual(101, len(heap))
+            heap.update(5, -1)
+            self.assertListEqual([5] + [key for key, _ in sorted(pairs, key=lambda pair: pair[1]) if key != 5],
+                                 [heap.pop().key for _ in range(101)])
+        self.assertRaises(Exception, IndexedMinHeap.heapify, [('A', 1), ('A', 2)])
+        self.assertEqual(0, len(IndexedMinHeap.heapify([])))
+
+    def test_peek(self):
+        heap = IndexedMinHeap()
+        self.assertRaises(Exception, heap.peek)
+        heap.insert('A', 10)
+        heap.insert('B', 1)
+        self.assertEqual(Node('B', 1), heap.peek())
+        self.assertEqual(2, len(heap))
+
+    def test_remove(self):
+        heap = IndexedMinHeap.heapify((key, (key * 7919) % 101) for key in range(101))
+        removed = [heap.remove(key) for key in range(0, 101, 3)]
+        self.assertListEqual([Node(key, (key * 7919) % 101) for key in range(0, 101, 3)], removed)
+        self.assertNotIn(3, heap)
+        self.assertIn(4, heap)
+        self.assertRaises(Exception, heap.remove, 3)
+        self.assertListEqual(sorted((key * 7919) % 101 for key in range(101) if key % 3), [node.score for node in heap.pop_many(101)])
+
+    def test_pop_many_and_pop_while(self):
+        heap = IndexedMinHeap.heapify((chr(i + 65), 100 - i) for i in range(10))
+        self.assertListEqual([Node('J', 91), Node('I', 92)], heap.pop_many(2))
+        self.assertListEqual([Node('H', 93), Node('G', 94), Node('F', 95)], heap.pop_while(95))
+        self.assertListEqual([], heap.pop_while(0))
+        self.assertEqual(5, len(heap.pop_many(100)))
+        self.assertListEqual([], heap.pop_many(1))
+
+
+class ArrayIndexedMinHeapTest(unittest.TestCase):
+    def test_pop(self):
+        heap = ArrayIndexedMinHeap(5)
+        for i in range(5):
+            heap.insert(i, 100 - i)
+        self.assertRaises(Exception, heap.insert, 0, 1)
+        self.assertEqual(5, len(heap))
+        self.assertListEqual([Node(i, 100 - i) for i in range(4, -1, -1)], [heap.pop() for _ in range(5)])
+        self.assertRaises(Exception, heap.pop)
+        self.assertNotIn(0, heap)
+
+    def test_key_range(self):
+        heap = ArrayIndexedMinHeap(5)
+        heap.insert(4, 1)
+        self.assertNotIn(-1, heap)
+        self.assertNotIn(5, heap)
+        for method in (heap.insert, heap.update, heap.decrease_key, heap.increase_key):
+            self.assertRaises(Exception, method, -1, 0)
+            self.assertRaises(Exception, method, 5, 0)
+        heap.insert(0, 2)
+        self.assertListEqual([Node(4, 1), Node(0, 2)], [heap.pop(), heap.pop()])
+
+    def test_iter(self):
+        heap = ArrayIndexedMinHeap(5, 2)
+        for i in range(5):
+            heap.insert(i, 100 - i)
+
+        self.assertListEqual([Node(4, 96), Node(3, 97), Node(1, 99), Node(0, 100), Node(2, 98)], list(iter(heap)))
+
+    def test_matches_indexed_min_heap(self):
+        for arity in range(2, 6):
+            heap, expected = ArrayIndexedMinHeap(101, arity, 'd'), IndexedMinHeap(arity)
+            for key in range(101):
+                heap.insert(key, (key * 7919) % 101)
+                expected.insert(key, (key * 7919) % 101)
+            for key in range(0, 101, 3):
+                heap.update(key, (key * 31) % 97)
+                expected.update(key, (key * 31) % 97)
+            for key in range(1, 101, 3):
+                heap.decrease_key(key, -key)
+                expected.decrease_key(key, -key)
+            for _ in range(50):
+                self.assertEqual(expected.pop(), heap.pop())
+            self.assertListEqual(list(expected), list(heap))
+
+
+class PairingIndexedMinHeapTest(unittest.TestCase):
+    def test_pop(self):
+        heap = PairingIndexedMinHeap()
+        for i in range(5):
+            heap.insert(chr(i + 65), 100 - i)
+        self.assertRaises(Exception, heap.insert, 'A', 1)
+        self.assertEqual(Node('E', 96), heap.peek())
+        self.assertListEqual([Node(chr(i + 65), 100 - i) for i in range(4, -1, -1)], [heap.pop() for _ in range(5)])
+        self.assertRaises(Exception, heap.pop)
+
+    def test_matches_indexed_min_heap(self):
+        heap, expected = PairingIndexedMinHeap(), IndexedMinHeap()
+        for key in range(101):
+            heap.insert(key, (key * 7919) % 101 * 1000 + key)
+            expected.insert(key, (key * 7919) % 101 * 1000 + key)
+        for key in range(0, 101, 3):
+            heap.update(key, (key * 31) % 97 * 1000 + key)
+            expected.update(key, (key * 31) % 97 * 1000 + key)
+        for key in range(1, 101, 3):
+            heap.decrease_key(key, -key)
+            expected.decrease_key(key, -key)
+        for key in range(2, 101, 6):
+            self.assertEqual(expected.remove(key), heap.remove(key))
+        for _ in range(30):
+            self.assertEqual(expected.pop(), heap.pop())
+        for key in range(3, 101, 6):
+            if key in expected:
+                heap.increase_key(key, 10 ** 6 + key)
+                expected.increase_key(key, 10 ** 6 + key)
+        self.assertEqual(len(expected), len(heap))
+        self.assertCountEqual([(node.key, node.score) for node in expected], [(node.key, node.score) for node in heap])
+        self.assertListEqual(expected.pop_many(len(expected)), [heap.pop() for _ in range(len(heap))])
+
 
 if __name__ == "__main__":
     unittest.main()
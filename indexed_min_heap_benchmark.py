@@ -0,0 +1,169 @@
+from __future__ import annotations
+from time import perf_counter
+from typing import Callable
+import argparse
+import math
+import tracemalloc
+import unittest
+
+from indexed_min_heap import ArrayIndexedMinHeap, IndexedMinHeap, PairingIndexedMinHeap
+
+
+def grid_weight(u: int, v: int) -> int:
+    """
+    a pseudo-random edge weight in 1..100, computed on the fly so a 10M-vertex graph needs no adjacency storage
+    """
+    return (min(u, v) * 2654435761 + max(u, v) * 40503) % 100 + 1
+
+
+def grid_neighbors(side: int, u: int):
+    row, col = divmod(u, side)
+    if row > 0:
+        yield u - side
+    if row < side - 1:
+        yield u + side
+    if col > 0:
+        yield u - 1
+    if col < side - 1:
+        yield u + 1
+
+
+def dijkstra(heap, side: int, source: int = 0) -> list[float]:
+    """
+    shortest distances from source over the side x side grid, driven by any heap with insert/decrease_key/pop
+    """
+    n = side * side
+    dist: list[float] = [math.inf] * n
+    settled = bytearray(n)
+    dist[source] = 0
+    heap.insert(source, 0)
+    queued = 1
+    while queued:
+        u = heap.pop().key
+        queued -= 1
+        settled[u] = 1
+        dist_u = dist[u]
+        for v in grid_neighbors(side, u):
+            if settled[v]:
+                continue
+            new_dist = dist_u + grid_weight(u, v)
+            if new_dist < dist[v]:
+                if dist[v] == math.inf:
+                    heap.insert(v, new_dist)
+                    queued += 1
+                else:
+                    heap.decrease_key(v, new_dist)
+                dist[v] = new_dist
+    return dist
+
+
+HEAPS: dict[str, Callable[[int], object]] = {
+    'IndexedMinHeap': lambda n: IndexedMinHeap(),
+    'ArrayIndexedMinHeap': lambda n: ArrayIndexedMinHeap(n),
+    'PairingIndexedMinHeap': lambda n: PairingIndexedMinHeap(),
+}
+
+Trace = list[tuple[str, tuple]]
+
+
+class TracingHeap:
+    """
+    forwards insert/update/decrease_key/increase_key/remove/pop to heap and records every call, so the trace can be replayed on other engines
+    """
+
+    def __init__(self, heap):
+        self.heap = heap
+        self.trace: Trace = []
+
+    def __getattr__(self, name: str):
+        method = getattr(self.heap, name)
+
+        def traced(*args):
+            self.trace.append((name, args))
+            return method(*args)
+
+        return traced
+
+
+def replay(trace: Trace, heap) -> float:
+    """
+    seconds taken by heap to run the recorded calls
+    """
+    calls = [(getattr(heap, name), args) for name, args in trace]
+    start = perf_counter()
+    for method, args in calls:
+        method(*args)
+    return perf_counter() - start
+
+
+def engines_for(trace: Trace) -> dict[str, Callable[[], object]]:
+    engines: dict[str, Callable[[], object]] = {
+        'IndexedMinHeap(2)': lambda: IndexedMinHeap(2),
+        'IndexedMinHeap(4)': lambda: IndexedMinHeap(4),
+        'IndexedMinHeap(8)': lambda: IndexedMinHeap(8),
+        'PairingIndexedMinHeap': PairingIndexedMinHeap,
+    }
+    keys = [args[0] for name, args in trace if name == 'insert']
+    if keys and all(isinstance(key, int) and key >= 0 for key in keys):
+        engines['ArrayIndexedMinHeap'] = lambda: ArrayIndexedMinHeap(max(keys) + 1)
+    return engines
+
+
+def pick_engine(trace: Trace, rounds: int = 3) -> tuple[str, dict[str, float]]:
+    """
+    replays trace on every applicable engine and returns the fastest one along with the best time of each
+    """
+    timings = {name: min(replay(trace, factory()) for _ in range(rounds)) for name, factory in engines_for(trace).items()}
+    return min(timings, key=timings.get), timings
+
+
+def heap_memory(factory: Callable[[int], object], n: int) -> int:
+    """
+    bytes held by a heap with all n keys inserted
+    """
+    tracemalloc.start()
+    heap = factory(n)
+    for key in range(n):
+        heap.insert(key, n - key)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def benchmark(vertices: int = 10_000_000):
+    side = math.isqrt(vertices)
+    for name, factory in HEAPS.items():
+        start = perf_counter()
+        dijkstra(factory(side * side), side)
+        elapsed = perf_counter() - start
+        print(f'{name:<22} {side * side} vertices {elapsed:.2f}s {heap_memory(factory, side * side) / 2 ** 20:.0f} MiB when full')
+
+    heap = TracingHeap(IndexedMinHeap())
+    dijkstra(heap, side)
+    best, timings = pick_engine(heap.trace)
+    for name, elapsed in timings.items():
+        print(f'{name:<22} replayed the trace in {elapsed:.2f}s')
+    print(f'best engine: {best}')
+
+
+class DijkstraTest(unittest.TestCase):
+    def test_heaps_agree(self):
+        side = 20
+        expected = dijkstra(IndexedMinHeap(2), side)
+        for name, factory in HEAPS.items():
+            self.assertListEqual(expected, dijkstra(factory(side * side), side), name)
+
+    def test_pick_engine(self):
+        heap = TracingHeap(IndexedMinHeap())
+        dijkstra(heap, 10)
+        self.assertEqual(('insert', (0, 0)), heap.trace[0])
+        best, timings = pick_engine(heap.trace, 1)
+        self.assertIn(best, timings)
+        self.assertIn('ArrayIndexedMinHeap', timings)
+        self.assertIn('PairingIndexedMinHeap', timings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='time Dijkstra on an implicit grid graph with every heap')
+    parser.add_argument('--vertices', type=int, default=10_000_000)
+    benchmark(parser.parse_args().vertices)
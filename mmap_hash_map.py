@@ -0,0 +1,258 @@
+from __future__ import annotations
+from collections.abc import Iterable, Iterator, Mapping
+from itertools import islice
+from struct import Struct
+from time import perf_counter
+from zlib import crc32
+import argparse
+import mmap
+import os
+import random
+import tempfile
+import unittest
+
+MAGIC = b'LPHASHST'
+# magic, capacity, item count, key size, val size
+HEADER = Struct('<8sQQII')
+
+
+def _slot_struct(key_size: int, val_size: int) -> Struct:
+    # used flag, key length, key, val length, val
+    return Struct(f'<BH{key_size}sH{val_size}s')
+
+
+def _hash(key: bytes) -> int:
+    # hash() of bytes is salted per process, so the file needs a stable hash
+    return crc32(key)
+
+
+def build(path: str, items: Iterable[tuple[bytes, bytes]], key_size: int, val_size: int, load_factor: float = 0.5, count: int = None):
+    """
+    writes items into a file laid out as a LinearProbingHashST with fixed-size slots; later items override earlier ones.
+    items is consumed in one streaming pass, so a table larger than memory can be built from a generator; count, the number of items,
+    sizes the table and is required unless items has a len()
+    """
+    if count is None:
+        if not hasattr(items, '__len__'):
+            raise Exception('count is required when items has no len()')
+        count = len(items)
+    capacity = 1
+    while count > capacity * load_factor:
+        capacity <<= 1
+
+    slot = _slot_struct(key_size, val_size)
+    size = HEADER.size + capacity * slot.size
+    # the table is written next to path and renamed onto it, so readers never see a partial file and a failed build keeps the old one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path) + '.')
+    try:
+        with open(fd, 'w+b') as f:
+            f.truncate(size)
+            with mmap.mmap(f.fileno(), size) as buf:
+                used_slots = 0
+                for key, val in items:
+                    if len(key) > key_size or len(val) > val_size:
+                        raise Exception(f'{key!r} or its value exceeds the slot size')
+                    init_bucket_idx = _hash(key) & (capacity - 1)
+                    for i in range(capacity):
+                        offset = HEADER.size + ((init_bucket_idx + i) & (capacity - 1)) * slot.size
+                        used, key_len, slot_key, _, _ = slot.unpack_from(buf, offset)
+                        if not used or slot_key[:key_len] == key:
+                            used_slots += not used
+                            slot.pack_into(buf, offset, 1, len(key), key, len(val), val)
+                            break
+                    else:
+                        raise Exception(f'table is full, there are more than {count} items')
+                HEADER.pack_into(buf, 0, MAGIC, capacity, used_slots, key_size, val_size)
+                buf.flush()
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class MmapLinearProbingHashST(Mapping):
+    """
+    read-only view of a table written by build(); opening only maps the file, pages are faulted in by the OS on first lookup and shared between processes
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.__buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.__capacity, self.__len, key_size, val_size = HEADER.unpack_from(self.__buf, 0)
+        if magic != MAGIC:
+            raise Exception(f'{path} is not a hash table file')
+        self.__slot = _slot_struct(key_size, val_size)
+
+    def __find(self, key: bytes) -> int:
+        """
+        offset of the slot holding key, or -1
+        """
+        init_bucket_idx = _hash(key) & (self.__capacity - 1)
+        for i in range(self.__capacity):
+            offset = HEADER.size + ((init_bucket_idx + i) & (self.__capacity - 1)) * self.__slot.size
+            used, key_len, slot_key, _, _ = self.__slot.unpack_from(self.__buf, offset)
+            if not used:
+                return -1
+            if slot_key[:key_len] == key:
+                return offset
+
+        return -1
+
+    def __getitem__(self, key: bytes) -> bytes:
+        """
+        None if the key does not exist
+        """
+        return self.get(key)
+
+    def get(self, key: bytes, default: object = None) -> bytes:
+        offset = self.__find(key)
+        if offset == -1:
+            return default
+        _, _, _, val_len, val = self.__slot.unpack_from(self.__buf, offset)
+        return val[:val_len]
+
+    def __contains__(self, key: bytes) -> bool:
+        return self.__find(key) != -1
+
+    def __len__(self) -> int:
+        return self.__len
+
+    def items(self) -> Iterator[tuple[bytes, bytes]]:
+        for offset in range(HEADER.size, HEADER.size + self.__capacity * self.__slot.size, self.__slot.size):
+            used, key_len, key, val_len, val = self.__slot.unpack_from(self.__buf, offset)
+            if used:
+                yield key[:key_len], val[:val_len]
+
+    def __iter__(self) -> Iterator[bytes]:
+        return (key for key, _ in self.items())
+
+    def close(self):
+        self.__buf.close()
+
+    def __enter__(self) -> MmapLinearProbingHashST:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def evict(path: str) -> bool:
+    """
+    asks the OS to drop the file's pages from the page cache, which only works once no mapping of it is open; False if unsupported
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return True
+
+
+def benchmark(path: str, lookups: int = 100000):
+    """
+    times opening the file, a first lookup pass, which faults pages in, and a second, warm pass,
+    then compares against rebuilding an in-memory dict from the file (what a process does without the mmap table);
+    the page cache is evicted before the cold pass and before the rebuild, so neither runs on pages read by an earlier step
+    """
+    # keys are taken from across the whole table and shuffled, as a contiguous prefix would be read sequentially and helped by readahead
+    with MmapLinearProbingHashST(path) as st:
+        keys = list(islice(st, 0, None, max(1, len(st) // lookups)))[:lookups]
+    random.shuffle(keys)
+    if not evict(path):
+        print('cannot evict the page cache here, so cold numbers are warm')
+
+    start = perf_counter()
+    st = MmapLinearProbingHashST(path)
+    print(f'open            {perf_counter() - start:.6f}s')
+    for label in ('cold lookups', 'warm lookups'):
+        start = perf_counter()
+        for key in keys:
+            st[key]
+        print(f'{label:<15} {perf_counter() - start:.4f}s for {len(keys)} keys')
+    st.close()
+
+    evict(path)
+    start = perf_counter()
+    with MmapLinearProbingHashST(path) as st:
+        dict(st.items())
+    print(f'rebuild dict    {perf_counter() - start:.4f}s')
+
+
+def read_tsv(source: str) -> Iterator[tuple[bytes, bytes]]:
+    with open(source, 'rb') as f:
+        for line_no, line in enumerate(f, 1):
+            key, tab, val = line.rstrip(b'\n').partition(b'\t')
+            if not tab:
+                raise Exception(f'{source}:{line_no} has no tab between key and value')
+            yield key, val
+
+
+def count_lines(source: str) -> int:
+    with open(source, 'rb') as f:
+        return sum(1 for _ in f)
+
+
+class MmapLinearProbingHashSTTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_basic(self):
+        build(self.path, [(str(i).encode(), f'v{i}'.encode()) for i in range(100)] + [(b'0', b'new')], 8, 8)
+        with MmapLinearProbingHashST(self.path) as st:
+            self.assertEqual(100, len(st))
+            self.assertEqual(b'new', st[b'0'])
+            self.assertEqual(b'v99', st[b'99'])
+            self.assertIsNone(st[b'100'])
+            self.assertNotIn(b'100', st)
+            self.assertDictEqual({str(i).encode(): f'v{i}'.encode() for i in range(1, 100)} | {b'0': b'new'}, dict(st.items()))
+
+    def test_streaming_build(self):
+        build(self.path, ((str(i).encode(), b'v') for i in range(1000)), 4, 1, count=1000)
+        with MmapLinearProbingHashST(self.path) as st:
+            self.assertEqual(1000, len(st))
+            self.assertEqual(b'v', st[b'999'])
+        self.assertRaises(Exception, build, self.path, iter([(b'a', b'b')]), 4, 4)
+        self.assertRaises(Exception, build, self.path, ((str(i).encode(), b'') for i in range(10)), 4, 4, count=2)
+        # a failed build leaves the existing table and no temp file behind
+        with MmapLinearProbingHashST(self.path) as st:
+            self.assertEqual(1000, len(st))
+        self.assertListEqual([os.path.basename(self.path)],
+                             [name for name in os.listdir(os.path.dirname(self.path)) if name.startswith(os.path.basename(self.path))])
+
+    def test_read_tsv(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'a\t1\nb\tx\ty\n')
+        self.assertListEqual([(b'a', b'1'), (b'b', b'x\ty')], list(read_tsv(self.path)))
+        self.assertEqual(2, count_lines(self.path))
+        with open(self.path, 'ab') as f:
+            f.write(b'no tab\n')
+        self.assertRaises(Exception, list, read_tsv(self.path))
+
+    def test_slot_overflow(self):
+        self.assertRaises(Exception, build, self.path, [(b'long key', b'')], 4, 4)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='build or benchmark a memory-mapped hash table')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='build a table from tab-separated key/value lines')
+    build_parser.add_argument('source')
+    build_parser.add_argument('path')
+    build_parser.add_argument('--key-size', type=int, default=32)
+    build_parser.add_argument('--val-size', type=int, default=32)
+    bench_parser = subparsers.add_parser('bench', help='time cold and warm starts of a built table')
+    bench_parser.add_argument('path')
+    bench_parser.add_argument('--lookups', type=int, default=100000)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        # two passes over the source, one to size the table and one to fill it, so no item is held in memory
+        build(args.path, read_tsv(args.source), args.key_size, args.val_size, count=count_lines(args.source))
+    else:
+        benchmark(args.path, args.lookups)
@@ -1,5 +1,11 @@
+from __future__ import annotations
+from collections.abc import Iterable, Iterator, Mapping, MutableMapping
 from dataclasses import dataclass
-import functools
+from time import perf_counter
+from typing import Callable
+import unittest
+
+import separate_chaining_hash_map
 
 
 @dataclass
@@ -9,9 +15,63 @@ class Node:
     deleted: bool = False
 
 
+@dataclass
+class ResizeEvent:
+    old_size: int
+    new_size: int
+    live_items: int
+    elapsed: float
+
+
+@dataclass
+class ProbeEvent:
+    op: str
+    key: object
+    probe_length: int
+
+
+class RecordingObserver:
+    """
+    collects the events emitted by ResizableOpenAddressingHashST, e.g., ResizableOpenAddressingHashST(observer=RecordingObserver())
+    """
+
+    def __init__(self):
+        self.resize_events: list[ResizeEvent] = []
+        self.probe_events: list[ProbeEvent] = []
+
+    def __call__(self, event: ResizeEvent | ProbeEvent):
+        if isinstance(event, ResizeEvent):
+            self.resize_events.append(event)
+        else:
+            self.probe_events.append(event)
+
+
 class LinearProbingHashST:
     def __init__(self, bucket_size: int):
-        self.__nodes: list[Node] = [None for i in range(bucket_size)]
+        self.__nodes: list[Node] = [None] * bucket_size
+        self.__used: int = 0  # slots holding a node, deleted or not
+        self.__live: int = 0
+
+    def __len__(self) -> int:
+        return self.__live
+
+    def capacity(self) -> int:
+        return len(self.__nodes)
+
+    def used_slots(self) -> int:
+        return self.__used
+
+    def probe_length(self, key: object) -> int:
+        """
+        number of slots inspected before the lookup of key terminates
+        """
+        init_bucket_idx = hash(key) & (len(self.__nodes) - 1)
+        for i in range(len(self.__nodes)):
+            nxt_bucket_idx = (init_bucket_idx + i) & (len(self.__nodes) - 1)
+            if self.__nodes[nxt_bucket_idx] == None or self.__nodes[nxt_bucket_idx].key == key:
+                return i + 1
+
+        return len(self.__nodes)
 
     def __find(self, key: object) -> int:
         init_bucket_idx = hash(key) & (len(self.__nodes) - 1)
@@ -28,22 +88,30 @@ class LinearProbingHashST:
             raise Exception('hash table is full')
         else:
             if self.__nodes[resulted_bucket_idx]:
+                if self.__nodes[resulted_bucket_idx].deleted:
+                    self.__live += 1
                 self.__nodes[resulted_bucket_idx].val = val
                 self.__nodes[resulted_bucket_idx].deleted = False
             else:
                 self.__nodes[resulted_bucket_idx] = Node(key, val)
+                self.__used += 1
+                self.__live += 1
 
     def __getitem__(self, key: object) -> object:
+        return self.get(key)
+
+    def get(self, key: object, default: object = None) -> object:
         resulted_bucket_idx = self.__find(key)
         if resulted_bucket_idx == -1 or self.__nodes[resulted_bucket_idx] == None or self.__nodes[resulted_bucket_idx].deleted:
-            return None
+            return default
         return self.__nodes[resulted_bucket_idx].val
 
     def __delitem__(self, key: object) -> object:
         resulted_bucket_idx = self.__find(key)
         if resulted_bucket_idx == -1 or self.__nodes[resulted_bucket_idx] == None or self.__nodes[resulted_bucket_idx].deleted:
-            raise Exception('key not found')
+            raise KeyError('key not found')
         self.__nodes[resulted_bucket_idx].deleted = True
+        self.__live -= 1
 
     def __repr__(self):
         return f'{[node for node in self.__nodes]}'
@@ -51,50 +119,200 @@ class LinearProbingHashST:
     def items(self):
         return ((node.key, node.val) for node in self.__nodes if node and not node.deleted)
 
+    def __iter__(self):
+        return (node.key for node in self.__nodes if node and not node.deleted)
 
-class ResizableOpenAddressingHashST:
+
+class ResizableOpenAddressingHashST(MutableMapping):
     INIT_HASH_TABLE_SIZE = 4
+    MAX_LOAD_FACTOR = 0.75
+    __MISSING = object()
 
-    def __init__(self):
+    def __init__(self, observer: Callable[[ResizeEvent | ProbeEvent], None] = None, capacity: int = INIT_HASH_TABLE_SIZE):
+        """
+        observer, if given, is called with a ResizeEvent after every resize and a ProbeEvent after every operation;
+        capacity is rounded up to a power of two
+        """
         self.__cur_size: int = ResizableOpenAddressingHashST.INIT_HASH_TABLE_SIZE
+        while self.__cur_size < capacity:
+            self.__cur_size *= 2
         self.__table: LinearProbingHashST = LinearProbingHashST(
             self.__cur_size)
+        self.__observer = observer
 
-    def __getitem__(self, key: object) -> object:
-        return self.__table[key]
+    @classmethod
+    def from_items(cls, items: Iterable[tuple[object, object]], observer: Callable[[ResizeEvent | ProbeEvent], None] = None) -> ResizableOpenAddressingHashST:
+        """
+        sizes the table for all items up front, so loading never triggers a resize
+        """
+        items = items if isinstance(items, (list, tuple)) else list(items)
+        st = cls(observer, ResizableOpenAddressingHashST.__capacity_for(len(items)))
+        st.set_many(items)
+        return st
 
     @staticmethod
-    def __print_upon_exit(func):
-        @functools.wraps(func)
-        def wrapped_func(self, *args, **kwargs):
-            func(self, *args, **kwargs)
-            print(self)
+    def __capacity_for(item_num: int) -> int:
+        capacity = ResizableOpenAddressingHashST.INIT_HASH_TABLE_SIZE
+        while item_num > capacity * ResizableOpenAddressingHashST.MAX_LOAD_FACTOR:
+            capacity *= 2
+        return capacity
+
+    def __lookup(self, key: object, default: object) -> object:
+        """
+        every read goes through here, so the observer sees a ProbeEvent for each of them
+        """
+        if self.__observer is not None:
+            self.__observer(ProbeEvent('get', key, self.__table.probe_length(key)))
+        return self.__table.get(key, default)
 
-        return wrapped_func
+    def __getitem__(self, key: object) -> object:
+        """
+        None if the key does not exist
+        """
+        return self.__lookup(key, None)
 
-    @__print_upon_exit
     def __setitem__(self, key: object, val: object):
-        try:
-            self.__table[key] = val
-        except Exception as ex:
-            print(ex, 'resizing...')
-            self.__cur_size *= 2
-            new_table = LinearProbingHashST(self.__cur_size)
-            for original_table_key, original_table_val in self.__table.items():
-                new_table[original_table_key] = original_table_val
-            new_table[key] = val
-            self.__table = new_table
+        if self.__observer is not None:
+            self.__observer(ProbeEvent('set', key, self.__table.probe_length(key)))
+        self.__table[key] = val
+        # resizing right after the insertion keeps at least one empty slot, so the inner table never reports being full
+        if self.__table.used_slots() > self.__cur_size * ResizableOpenAddressingHashST.MAX_LOAD_FACTOR:
+            self.__resize()
 
-    @__print_upon_exit
     def __delitem__(self, key):
+        if self.__observer is not None:
+            self.__observer(ProbeEvent('del', key, self.__table.probe_length(key)))
         del self.__table[key]
 
+    def __len__(self) -> int:
+        return len(self.__table)
+
+    def __iter__(self) -> Iterator[object]:
+        return iter(self.__table)
+
+    def items(self):
+        return self.__table.items()
+
+    def __contains__(self, key: object) -> bool:
+        return self.__lookup(key, ResizableOpenAddressingHashST.__MISSING) is not ResizableOpenAddressingHashST.__MISSING
+
+    def get(self, key: object, default: object = None) -> object:
+        return self.__lookup(key, default)
+
+    def pop(self, key: object, default: object = __MISSING) -> object:
+        val = self.__lookup(key, ResizableOpenAddressingHashST.__MISSING)
+        if val is ResizableOpenAddressingHashST.__MISSING:
+            if default is ResizableOpenAddressingHashST.__MISSING:
+                raise KeyError(key)
+            return default
+        del self[key]
+        return val
+
+    def setdefault(self, key: object, default: object = None) -> object:
+        val = self.__lookup(key, ResizableOpenAddressingHashST.__MISSING)
+        if val is ResizableOpenAddressingHashST.__MISSING:
+            self[key] = val = default
+        return val
+
+    def update(self, other: Mapping | Iterable[tuple[object, object]] = (), /, **kwargs):
+        self.set_many(other.items() if isinstance(other, Mapping) else other)
+        self.set_many(kwargs.items())
+
+    def get_many(self, keys: Iterable[object], default: object = None) -> list[object]:
+        if self.__observer is None:
+            get = self.__table.get
+            return [get(key, default) for key in keys]
+        return [self.__lookup(key, default) for key in keys]
+
+    def set_many(self, items: Iterable[tuple[object, object]]):
+        """
+        grows the table at most once for the whole batch, assuming the keys are new
+        """
+        items = items if isinstance(items, (list, tuple)) else list(items)
+        capacity = ResizableOpenAddressingHashST.__capacity_for(self.__table.used_slots() + len(items))
+        if capacity > self.__cur_size:
+            self.__rehash(capacity)
+        for key, val in items:
+            self[key] = val
+
+    def __resize(self):
+        # deleted nodes are dropped while rehashing, so only grow when live keys alone would be too dense
+        if len(self.__table) * 2 > self.__cur_size * ResizableOpenAddressingHashST.MAX_LOAD_FACTOR:
+            self.__rehash(self.__cur_size * 2)
+        else:
+            self.__rehash(self.__cur_size)
+
+    def __rehash(self, new_size: int):
+        start = perf_counter() if self.__observer is not None else 0.0
+        old_size = self.__cur_size
+        self.__cur_size = new_size
+        new_table = LinearProbingHashST(self.__cur_size)
+        for original_table_key, original_table_val in self.__table.items():
+            new_table[original_table_key] = original_table_val
+        self.__table = new_table
+        if self.__observer is not None:
+            self.__observer(ResizeEvent(old_size, self.__cur_size, len(new_table), perf_counter() - start))
+
     def __repr__(self):
         return f'{self.__cur_size} {self.__table}'
 
 
+class ResizableOpenAddressingHashSTTest(separate_chaining_hash_map.TestSeparateChainingHashST):
+    ST = ResizableOpenAddressingHashST
+
+    def test_basic(self):
+        st = ResizableOpenAddressingHashST()
+        for i in range(100):
+            st[i * 4] = i
+        for i in range(100):
+            self.assertEqual(i, st[i * 4])
+        del st[16]
+        self.assertIsNone(st[16])
+        self.assertRaises(Exception, st.__delitem__, 16)
+
+    def test_churn_does_not_fill_table(self):
+        st = ResizableOpenAddressingHashST()
+        for i in range(1000):
+            st[i] = i
+            del st[i]
+        st[0] = 100
+        self.assertEqual(100, st[0])
+
+    def test_get_many_with_observer(self):
+        observer = RecordingObserver()
+        st = ResizableOpenAddressingHashST.from_items([(1, 1)], observer)
+        self.assertListEqual([1, 'x'], st.get_many([1, 2], 'x'))
+        self.assertListEqual([('get', 1), ('get', 2)], [(event.op, event.key) for event in observer.probe_events[-2:]])
+
+    def test_every_read_reports_a_probe(self):
+        observer = RecordingObserver()
+        st = ResizableOpenAddressingHashST.from_items([(1, 1)], observer)
+        st.get(1)
+        2 in st
+        st.setdefault(3)
+        st.pop(1)
+        self.assertListEqual([('get', 1), ('get', 2), ('get', 3), ('set', 3), ('get', 1), ('del', 1)],
+                             [(event.op, event.key) for event in observer.probe_events[-6:]])
+
+    def test_from_items_does_not_resize(self):
+        observer = RecordingObserver()
+        st = ResizableOpenAddressingHashST.from_items([(i, i) for i in range(1000)], observer)
+        self.assertListEqual([], observer.resize_events)
+        self.assertEqual(list(range(1000)), st.get_many(range(1000)))
+
+    def test_observer(self):
+        observer = RecordingObserver()
+        st = ResizableOpenAddressingHashST(observer)
+        for i in range(7):
+            st[i * 4] = i
+        st[0]
+        self.assertEqual([(4, 8), (8, 16)], [(event.old_size, event.new_size) for event in observer.resize_events])
+        self.assertEqual(['set'] * 7 + ['get'], [event.op for event in observer.probe_events])
+        self.assertEqual([1, 2, 3, 4], [event.probe_length for event in observer.probe_events[:4]])
+
+
 if __name__ == '__main__':
-    st = ResizableOpenAddressingHashST()
+    st = ResizableOpenAddressingHashST(print)
     st[0] = 100
     st[4] = 101
     st[8] = 102
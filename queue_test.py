@@ -1,25 +1,186 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from collections import deque
+from functools import partial
 from threading import Thread
 from queue import Queue
-from time import sleep
+from time import monotonic, perf_counter, sleep
+import asyncio
+import multiprocessing
+import unittest
+
+class Histogram:
+    """
+    durations counted in power-of-two buckets: bucket i holds durations under 2**i microseconds,
+    so recording is one bit_length and percentiles are accurate to a factor of two
+    """
+    BUCKETS = 40
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float, count: int = 1):
+        self.counts[min(int(seconds * 1e6).bit_length(), self.BUCKETS - 1)] += count
+        self.count += count
+        self.total += seconds * count
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: 'Histogram'):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """
+        upper bound in seconds of the bucket holding the q-quantile (0 < q <= 1)
+        """
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= q * self.count:
+                return min(2 ** idx / 1e6, self.max)
+        return 0.0
+
+class WorkerMetrics:
+    """
+    owned by one worker thread, so recording takes no lock
+    """
+    def __init__(self):
+        self.items = 0
+        self.service = Histogram()
+        self.started: float = None
+        self.stopped: float = None
+
+    def record(self, seconds: float, items: int = 1):
+        """
+        a batch of items that took seconds counts as items items of seconds / items each
+        """
+        self.items += items
+        self.service.add(seconds / items, items)
+
+class QueueMetrics:
+    """
+    updated by ClosableQueue while it holds its own lock: time each item waited in the queue, and the queue depth,
+    sampled at most once per sample_interval seconds into running max/mean and a ring buffer of the last history samples,
+    so memory stays flat however long the queue lives
+    """
+    def __init__(self, sample_interval: float = 0.01, history: int = 1000):
+        self.sample_interval = sample_interval
+        self.wait = Histogram()
+        self.depths: deque[tuple[float, int]] = deque(maxlen=history)  # (perf_counter(), qsize()), newest last
+        self.depth_max = 0
+        self.depth_total = 0
+        self.depth_samples = 0
+        self.__last_sample: float = None
+        self.__enqueued: deque[float] = deque()  # put times of the queued items, oldest first like the queue itself
+
+    def on_put(self, depth: int):
+        now = perf_counter()
+        self.__enqueued.append(now)
+        self.__sample(now, depth)
+
+    def on_get(self, depth: int, is_sentinel: bool):
+        now = perf_counter()
+        enqueued = self.__enqueued.popleft()
+        if not is_sentinel:
+            self.wait.add(now - enqueued)
+        self.__sample(now, depth)
+
+    def __sample(self, now: float, depth: int):
+        if self.__last_sample is None or now - self.__last_sample >= self.sample_interval:
+            self.__last_sample = now
+            self.depths.append((now, depth))
+            self.depth_max = max(self.depth_max, depth)
+            self.depth_total += depth
+            self.depth_samples += 1
+
+    def depth_mean(self) -> float:
+        return self.depth_total / self.depth_samples if self.depth_samples else 0.0
 
 class StoppableWorker(Thread):
-    def __init__(self, func: callable, in_queue: Queue, out_queue: Queue):
+    """
+    with batch_size, the worker takes up to batch_size items per lock round-trip and func maps a list of items to a list of results;
+    with metrics, it records the time spent in func per item;
+    the first exception raised by func is kept in error, and the worker then drains in_queue up to its SENTINEL without
+    calling func again, so whoever feeds in_queue never blocks on a dead stage
+    """
+    def __init__(self, func: callable, in_queue: Queue, out_queue: Queue, batch_size: int = 0, metrics: WorkerMetrics = None):
         super().__init__()
         self.func = func
         self.in_queue = in_queue
         self.out_queue = out_queue
+        self.batch_size = batch_size
+        self.metrics = metrics
+        self.error: Exception = None
 
     def run(self):
-        for item in self.in_queue:
-            result = self.func(item)
-            self.out_queue.put(result)
-            self.in_queue.task_done()
+        if self.metrics is not None:
+            self.metrics.started = perf_counter()
+        if self.batch_size:
+            for batch in self.in_queue.iter_batches(self.batch_size):
+                if self.error is None:
+                    try:
+                        results = self.__call(batch, len(batch))
+                    except Exception as error:
+                        self.error = error
+                    else:
+                        self.out_queue.put_many(results)
+                self.in_queue.tasks_done(len(batch))
+        else:
+            for item in self.in_queue:
+                if self.error is None:
+                    try:
+                        result = self.__call(item, 1)
+                    except Exception as error:
+                        self.error = error
+                    else:
+                        self.out_queue.put(result)
+                self.in_queue.task_done()
+        if self.metrics is not None:
+            self.metrics.stopped = perf_counter()
+
+    def __call(self, arg: object, items: int) -> object:
+        if self.metrics is None:
+            return self.func(arg)
+        start = perf_counter()
+        result = self.func(arg)
+        self.metrics.record(perf_counter() - start, items)
+        return result
+
+def map_batch(func: callable, items: list) -> list:
+    return [func(item) for item in items]
 
 class ClosableQueue(Queue):
     SENTINEL = object()
 
-    def close(self):
-        self.put(self.SENTINEL)
+    def __init__(self, maxsize: int = 0, metrics: QueueMetrics = None):
+        super().__init__(maxsize)
+        self.metrics = metrics
+
+    def _put(self, item: object):
+        super()._put(item)
+        if self.metrics is not None:
+            self.metrics.on_put(self._qsize())
+
+    def _get(self) -> object:
+        item = super()._get()
+        if self.metrics is not None:
+            self.metrics.on_get(self._qsize(), item is self.SENTINEL)
+        return item
+
+    def close(self, consumers: int = 1):
+        """
+        every consumer stops at the first SENTINEL it gets, so a queue read by n workers needs n of them
+        """
+        for _ in range(consumers):
+            self.put(self.SENTINEL)
     
     def __iter__(self):
         while True:
@@ -29,6 +190,341 @@ class ClosableQueue(Queue):
                 return
             yield item
 
+    def put_many(self, items):
+        """
+        puts all items under one acquisition of the queue lock, waiting for room whenever a bounded queue is full
+        """
+        with self.not_full:
+            for item in items:
+                if self.maxsize > 0:
+                    while self._qsize() >= self.maxsize:
+                        self.not_full.wait()
+                self._put(item)
+                self.unfinished_tasks += 1
+                self.not_empty.notify()
+
+    def get_batch(self, max_items: int, timeout: float = None) -> list:
+        """
+        waits up to timeout (forever if None) for the first item, then takes up to max_items items that are already queued;
+        returns [] on timeout, and a batch ends early with the SENTINEL if it reaches one
+        """
+        with self.not_empty:
+            if timeout is None:
+                while not self._qsize():
+                    self.not_empty.wait()
+            else:
+                endtime = monotonic() + timeout
+                while not self._qsize():
+                    remaining = endtime - monotonic()
+                    if remaining <= 0.0:
+                        return []
+                    self.not_empty.wait(remaining)
+            batch = []
+            while self._qsize() and len(batch) < max_items:
+                batch.append(self._get())
+                if batch[-1] is self.SENTINEL:
+                    break
+            self.not_full.notify(len(batch))
+            return batch
+
+    def tasks_done(self, count: int):
+        """
+        task_done for count items at once
+        """
+        with self.all_tasks_done:
+            unfinished = self.unfinished_tasks - count
+            if unfinished < 0:
+                raise ValueError('task_done() called too many times')
+            if unfinished == 0:
+                self.all_tasks_done.notify_all()
+            self.unfinished_tasks = unfinished
+
+    def iter_batches(self, max_items: int):
+        """
+        like __iter__, but yields lists of up to max_items items; the caller calls tasks_done for each batch
+        """
+        while True:
+            batch = self.get_batch(max_items)
+            if batch[-1] is self.SENTINEL:
+                if len(batch) > 1:
+                    yield batch[:-1]
+                self.task_done()
+                return
+            yield batch
+
+THREADS = 'threads'
+PROCESSES = 'processes'
+ASYNC = 'async'  # func is a coroutine function; AsyncPipeline only
+
+
+@dataclass
+class Stage:
+    """
+    workers threads all read the stage's input queue and write the next one; with the PROCESSES backend each thread
+    hands its item to a pool of workers processes and waits, so CPU-bound funcs escape the GIL
+    (func and items must then be picklable, i.e. func must be a module-level function);
+    queue_size bounds the stage's input queue (0 is unbounded), so a fast upstream stage blocks instead of buffering ahead,
+    and batch_size makes each worker move micro-batches of items through the queues and the process pool
+    """
+    func: callable
+    workers: int = 1
+    backend: str = THREADS
+    queue_size: int = 0
+    batch_size: int = 0
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    the pipeline's worker threads may already run when a pool forks, and forking a multi-threaded process can copy locks
+    held by other threads; forkserver (spawn where it is missing) starts workers from a clean process instead
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(method))
+
+
+def _run_in_pool(pool: ProcessPoolExecutor, func: callable, item: object):
+    return pool.submit(func, item).result()
+
+
+class Pipeline:
+    """
+    chains stages through ClosableQueues; queues[0] is the input and queues[-1] collects the results;
+    with metrics, every stage input queue and worker is instrumented and stats()/summary() report them
+    """
+
+    def __init__(self, stages: list[Stage], metrics: bool = False):
+        for stage in stages:
+            if stage.backend not in (THREADS, PROCESSES):
+                raise Exception(f'unknown backend {stage.backend}')
+        self.queues = [ClosableQueue(stage.queue_size, QueueMetrics() if metrics else None) for stage in stages] + [ClosableQueue()]
+        self.__stages = stages
+        self.__metrics = metrics
+        self.__pools: list[ProcessPoolExecutor] = []
+        self.__workers: list[list[StoppableWorker]] = []
+        for stage, in_queue, out_queue in zip(stages, self.queues, self.queues[1:]):
+            func = partial(map_batch, stage.func) if stage.batch_size else stage.func
+            if stage.backend == PROCESSES:
+                pool = _process_pool(stage.workers)
+                self.__pools.append(pool)
+                func = partial(_run_in_pool, pool, func)
+            self.__workers.append([StoppableWorker(func, in_queue, out_queue, stage.batch_size, WorkerMetrics() if metrics else None)
+                                   for _ in range(stage.workers)])
+
+    def start(self):
+        for workers in self.__workers:
+            for worker in workers:
+                worker.start()
+
+    def put(self, item: object):
+        self.queues[0].put(item)
+
+    def close(self):
+        """
+        shuts the stages down in order: a stage's input is closed only after every worker of the previous stage has exited,
+        so no result can arrive behind the sentinels; then re-raises the first exception of the earliest failed stage
+        """
+        for stage, in_queue, workers in zip(self.__stages, self.queues, self.__workers):
+            in_queue.close(stage.workers)
+            for worker in workers:
+                worker.join()
+        for pool in self.__pools:
+            pool.shutdown()
+        for workers in self.__workers:
+            for worker in workers:
+                if worker.error is not None:
+                    raise worker.error
+
+    def run(self, items) -> list:
+        """
+        pushes items through every stage and returns the results in completion order
+        """
+        self.start()
+        for item in items:
+            self.put(item)
+        self.close()
+        self.queues[-1].close()
+        return list(self.queues[-1])
+
+    def stats(self) -> list[dict]:
+        """
+        one dict per stage once the pipeline is closed: items, throughput over the stage's lifetime, and the p50/p99 of
+        the per-item service time and of the time items waited in the stage's input queue, all in seconds
+        """
+        if not self.__metrics:
+            raise Exception('pipeline was created without metrics')
+        stats = []
+        for stage, queue, workers in zip(self.__stages, self.queues, self.__workers):
+            service = Histogram()
+            for worker in workers:
+                service.merge(worker.metrics.service)
+            items = sum(worker.metrics.items for worker in workers)
+            elapsed = max(worker.metrics.stopped for worker in workers) - min(worker.metrics.started for worker in workers)
+            stats.append({
+                'stage': getattr(stage.func, '__name__', repr(stage.func)),
+                'workers': stage.workers,
+                'items': items,
+                'items_per_second': items / elapsed if elapsed else 0.0,
+                'service_p50': service.percentile(0.5),
+                'service_p99': service.percentile(0.99),
+                'wait_p50': queue.metrics.wait.percentile(0.5),
+                'wait_p99': queue.metrics.wait.percentile(0.99),
+                'depth_max': queue.metrics.depth_max,
+                'depth_mean': queue.metrics.depth_mean(),
+            })
+        return stats
+
+    def summary(self) -> str:
+        lines = [f'{"stage":<12} {"workers":>7} {"items":>8} {"items/s":>10} {"service p50/p99":>18} {"wait p50/p99":>18} {"depth max/mean":>15}']
+        for stat in self.stats():
+            lines.append(f'{stat["stage"]:<12} {stat["workers"]:>7} {stat["items"]:>8} {stat["items_per_second"]:>10.1f} '
+                         f'{stat["service_p50"] * 1e3:>8.2f}/{stat["service_p99"] * 1e3:<7.2f}ms '
+                         f'{stat["wait_p50"] * 1e3:>8.2f}/{stat["wait_p99"] * 1e3:<7.2f}ms '
+                         f'{stat["depth_max"]:>7}/{stat["depth_mean"]:<7.1f}')
+        return '\n'.join(lines)
+
+
+class AsyncClosableQueue(asyncio.Queue):
+    SENTINEL = object()
+
+    async def close(self, consumers: int = 1):
+        for _ in range(consumers):
+            await self.put(self.SENTINEL)
+
+    async def __aiter__(self):
+        while True:
+            item = await self.get()
+            if item is self.SENTINEL:
+                self.task_done()
+                return
+            yield item
+
+    async def put_many(self, items):
+        for item in items:
+            await self.put(item)
+
+    async def get_batch(self, max_items: int) -> list:
+        """
+        waits for the first item, then takes up to max_items items that are already queued, ending early at a SENTINEL
+        """
+        batch = [await self.get()]
+        while batch[-1] is not self.SENTINEL and len(batch) < max_items and not self.empty():
+            batch.append(self.get_nowait())
+        return batch
+
+    def tasks_done(self, count: int):
+        for _ in range(count):
+            self.task_done()
+
+    async def iter_batches(self, max_items: int):
+        while True:
+            batch = await self.get_batch(max_items)
+            if batch[-1] is self.SENTINEL:
+                if len(batch) > 1:
+                    yield batch[:-1]
+                self.task_done()
+                return
+            yield batch
+
+
+class AsyncStoppableWorker:
+    """
+    StoppableWorker as a task: func is a coroutine function, awaited once per item (or per batch with batch_size);
+    like StoppableWorker, it keeps func's first exception in error and drains in_queue up to its SENTINEL
+    """
+    def __init__(self, func: callable, in_queue: AsyncClosableQueue, out_queue: AsyncClosableQueue, batch_size: int = 0):
+        self.func = func
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.batch_size = batch_size
+        self.error: Exception = None
+
+    async def run(self):
+        if self.batch_size:
+            async for batch in self.in_queue.iter_batches(self.batch_size):
+                if self.error is None:
+                    try:
+                        results = await self.func(batch)
+                    except Exception as error:
+                        self.error = error
+                    else:
+                        await self.out_queue.put_many(results)
+                self.in_queue.tasks_done(len(batch))
+            return
+        async for item in self.in_queue:
+            if self.error is None:
+                try:
+                    result = await self.func(item)
+                except Exception as error:
+                    self.error = error
+                else:
+                    await self.out_queue.put(result)
+            self.in_queue.task_done()
+
+
+async def _gather_batch(func: callable, items: list) -> list:
+    return await asyncio.gather(*map(func, items))
+
+
+def _offload(executor: Executor, func: callable) -> callable:
+    async def offloaded(item: object):
+        return await asyncio.get_running_loop().run_in_executor(executor, func, item)
+    return offloaded
+
+
+class AsyncPipeline:
+    """
+    Pipeline on one event loop, taking the same Stages: each stage runs workers tasks, which bounds its concurrency;
+    ASYNC stages await func directly, THREADS and PROCESSES stages offload the blocking func to a thread or process pool
+    of workers, so stage functions written for Pipeline work unchanged
+    """
+
+    def __init__(self, stages: list[Stage]):
+        for stage in stages:
+            if stage.backend not in (ASYNC, THREADS, PROCESSES):
+                raise Exception(f'unknown backend {stage.backend}')
+        self.queues = [AsyncClosableQueue(stage.queue_size) for stage in stages] + [AsyncClosableQueue()]
+        self.__stages = stages
+        self.__executors: list[Executor] = []
+        self.__workers: list[list[AsyncStoppableWorker]] = []
+        self.__tasks: list[list[asyncio.Task]] = []
+        for stage, in_queue, out_queue in zip(stages, self.queues, self.queues[1:]):
+            if stage.backend == ASYNC:
+                func = partial(_gather_batch, stage.func) if stage.batch_size else stage.func
+            else:
+                executor = ThreadPoolExecutor(stage.workers) if stage.backend == THREADS else _process_pool(stage.workers)
+                self.__executors.append(executor)
+                func = _offload(executor, partial(map_batch, stage.func) if stage.batch_size else stage.func)
+            self.__workers.append([AsyncStoppableWorker(func, in_queue, out_queue, stage.batch_size) for _ in range(stage.workers)])
+
+    def start(self):
+        self.__tasks = [[asyncio.create_task(worker.run()) for worker in workers] for workers in self.__workers]
+
+    async def put(self, item: object):
+        await self.queues[0].put(item)
+
+    async def close(self):
+        """
+        shuts the stages down in order like Pipeline.close, then re-raises the first exception of the earliest failed stage
+        """
+        for stage, in_queue, tasks in zip(self.__stages, self.queues, self.__tasks):
+            await in_queue.close(stage.workers)
+            await asyncio.gather(*tasks)
+        for executor in self.__executors:
+            executor.shutdown()
+        for workers in self.__workers:
+            for worker in workers:
+                if worker.error is not None:
+                    raise worker.error
+
+    async def run(self, items) -> list:
+        self.start()
+        for item in items:
+            await self.put(item)
+        await self.close()
+        await self.queues[-1].close()
+        return [item async for item in self.queues[-1]]
+
+
 def consume(queue: Queue):
     print("consume getting")
     print('consume received item: ', queue.get())
@@ -52,8 +548,9 @@ def transform(work_item: object):
     return f'transformed {work_item}'
 
 def closeable_queue_test():
-    download_queue = ClosableQueue()
-    transform_queue = ClosableQueue()
+    # bounded, so download cannot run more than a couple of items ahead of transform
+    download_queue = ClosableQueue(2)
+    transform_queue = ClosableQueue(2)
     done_queue = ClosableQueue()
     workers = [
         StoppableWorker(download, download_queue, transform_queue),
@@ -76,6 +573,27 @@ def closeable_queue_test():
     for worker in workers:
         worker.join()
 
+def pipeline_test():
+    pipeline = Pipeline([
+        Stage(download, workers=5, queue_size=10),
+        Stage(transform, workers=2, backend=PROCESSES, queue_size=10, batch_size=4),
+    ], metrics=True)
+    results = pipeline.run(f'item {i}' for i in range(5))
+    print(f'Received {len(results)} items from the pipeline')
+    print(pipeline.summary())
+
+async def download_async(work_item: object):
+    await asyncio.sleep(0.1)
+    return f'downloaded {work_item}'
+
+def async_pipeline_test():
+    pipeline = AsyncPipeline([
+        Stage(download_async, workers=1000, backend=ASYNC),
+        Stage(transform, workers=100, queue_size=100),
+    ])
+    results = asyncio.run(pipeline.run(f'item {i}' for i in range(1000)))
+    print(f'Received {len(results)} items from the async pipeline')
+
 def simple_queue_test():
     my_queue = Queue(1)
     ct = Thread(target=consume, args=[my_queue])
@@ -84,6 +602,198 @@ def simple_queue_test():
     sleep(0.5)
     pt.start()
 
+def square(x: int) -> int:
+    return x * x
+
+class PipelineTest(unittest.TestCase):
+    def test_close_stops_every_consumer(self):
+        queue, out = ClosableQueue(), ClosableQueue()
+        workers = [StoppableWorker(square, queue, out) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for i in range(10):
+            queue.put(i)
+        queue.close(len(workers))
+        for worker in workers:
+            worker.join(5)
+            self.assertFalse(worker.is_alive())
+        queue.join()
+        self.assertEqual(10, out.qsize())
+
+    def test_pipeline(self):
+        pipeline = Pipeline([
+            Stage(str, workers=3),
+            Stage(len, workers=2),
+            Stage(square),
+        ])
+        self.assertListEqual(sorted(len(str(i)) ** 2 for i in range(200)), sorted(pipeline.run(range(200))))
+
+    def test_failing_stage(self):
+        def fail_on_3(x):
+            if x == 3:
+                raise ValueError('bad item 3')
+            return x
+
+        pipeline = Pipeline([Stage(fail_on_3, workers=2), Stage(square)])
+        self.assertRaisesRegex(ValueError, 'bad item 3', pipeline.run, range(20))
+        pipeline = Pipeline([Stage(int, workers=2, backend=PROCESSES), Stage(square)])
+        self.assertRaises(ValueError, pipeline.run, ['1', 'x', '3'])
+
+    def test_failing_bounded_stage(self):
+        def fail_on_3(x):
+            if x == 3:
+                raise ValueError('bad item 3')
+            return x
+
+        def run(pipeline):
+            try:
+                pipeline.run(range(50))
+            except ValueError as error:
+                errors.append(error)
+
+        for batch_size in (0, 4):
+            errors = []
+            pipeline = Pipeline([Stage(abs, queue_size=2), Stage(fail_on_3, queue_size=2, batch_size=batch_size), Stage(str, queue_size=1)])
+            runner = Thread(target=run, args=(pipeline,))
+            runner.start()
+            runner.join(5)
+            self.assertFalse(runner.is_alive())
+            self.assertEqual(['bad item 3'], [str(error) for error in errors])
+
+    def test_process_stage(self):
+        pipeline = Pipeline([Stage(square, workers=2, backend=PROCESSES), Stage(str)])
+        self.assertListEqual(sorted(str(i * i) for i in range(20)), sorted(pipeline.run(range(20))))
+        self.assertRaises(Exception, Pipeline, [Stage(square, backend='fibers')])
+
+    def test_batches(self):
+        queue = ClosableQueue()
+        queue.put_many(range(5))
+        self.assertListEqual([0, 1, 2], queue.get_batch(3))
+        queue.close()
+        self.assertListEqual([3, 4, ClosableQueue.SENTINEL], queue.get_batch(10))
+        self.assertListEqual([], queue.get_batch(10, timeout=0.01))
+        queue.tasks_done(6)
+        queue.join()
+        self.assertRaises(ValueError, queue.tasks_done, 1)
+
+        queue.put_many(range(7))
+        queue.close(2)
+        self.assertListEqual([[0, 1, 2], [3, 4, 5], [6]], list(queue.iter_batches(3)))
+        self.assertListEqual([], list(queue.iter_batches(3)))
+
+    def test_backpressure(self):
+        queue, out = ClosableQueue(3), ClosableQueue()
+        depths = []
+
+        def slow_square(batch):
+            depths.append(queue.qsize())
+            sleep(0.001)
+            return map_batch(square, batch)
+
+        worker = StoppableWorker(slow_square, queue, out, batch_size=2)
+        worker.start()
+        queue.put_many(range(50))
+        queue.close()
+        worker.join()
+        self.assertLessEqual(max(depths), 3)
+        self.assertListEqual([i * i for i in range(50)], list(out.get_batch(100)))
+
+    def test_batched_pipeline(self):
+        pipeline = Pipeline([
+            Stage(str, workers=3, queue_size=4, batch_size=5),
+            Stage(len, workers=2, backend=PROCESSES, queue_size=4, batch_size=8),
+            Stage(square, queue_size=1),
+        ])
+        self.assertListEqual(sorted(len(str(i)) ** 2 for i in range(200)), sorted(pipeline.run(range(200))))
+
+    def test_histogram(self):
+        histogram = Histogram()
+        for micros in range(1, 1001):
+            histogram.add(micros / 1e6)
+        histogram.add(0.5, 10)
+        self.assertEqual(1010, histogram.count)
+        self.assertAlmostEqual(5.5005, histogram.total)
+        self.assertEqual(512e-6, histogram.percentile(0.5))
+        self.assertEqual(0.5, histogram.percentile(1))
+        self.assertEqual(0.0, Histogram().percentile(0.5))
+
+    def test_depth_history_is_bounded(self):
+        metrics = QueueMetrics(sample_interval=0, history=10)
+        queue = ClosableQueue(metrics=metrics)
+        queue.put_many(range(100))
+        for _ in range(100):
+            queue.get()
+        self.assertEqual(10, len(metrics.depths))
+        self.assertEqual(0, metrics.depths[-1][1])
+        self.assertEqual(100, metrics.depth_max)
+        self.assertEqual(200, metrics.depth_samples)
+        self.assertAlmostEqual(50, metrics.depth_mean())
+
+    def test_metrics(self):
+        def slow_len(text):
+            sleep(0.001)
+            return len(text)
+
+        pipeline = Pipeline([
+            Stage(str, workers=2, queue_size=4, batch_size=5),
+            Stage(slow_len, workers=2),
+            Stage(square),
+        ], metrics=True)
+        self.assertListEqual(sorted(len(str(i)) ** 2 for i in range(100)), sorted(pipeline.run(range(100))))
+        stats = pipeline.stats()
+        self.assertListEqual(['str', 'slow_len', 'square'], [stat['stage'] for stat in stats])
+        self.assertListEqual([100, 100, 100], [stat['items'] for stat in stats])
+        self.assertLessEqual(stats[0]['depth_max'], 4)
+        self.assertGreaterEqual(stats[1]['service_p50'], 0.001)
+        for stat in stats:
+            self.assertGreater(stat['items_per_second'], 0)
+            self.assertLessEqual(stat['wait_p50'], stat['wait_p99'])
+        self.assertIn('slow_len', pipeline.summary())
+        self.assertRaises(Exception, Pipeline([Stage(str)]).stats)
+
+    def test_async_pipeline(self):
+        async def delayed_square(x):
+            await asyncio.sleep(0.01)
+            return square(x)
+
+        pipeline = AsyncPipeline([
+            Stage(delayed_square, workers=100, backend=ASYNC),
+            Stage(str, workers=3, queue_size=4),
+            Stage(len, workers=2, backend=PROCESSES, batch_size=8),
+            Stage(delayed_square, workers=10, backend=ASYNC, queue_size=2, batch_size=3),
+        ])
+        start = monotonic()
+        results = asyncio.run(pipeline.run(range(300)))
+        self.assertLess(monotonic() - start, 2)
+        self.assertListEqual(sorted(len(str(i * i)) ** 2 for i in range(300)), sorted(results))
+        self.assertRaises(Exception, AsyncPipeline, [Stage(square, backend='fibers')])
+
+    def test_failing_async_stage(self):
+        async def fail_on_3(x):
+            if x == 3:
+                raise ValueError('bad item 3')
+            return x
+
+        for stages in ([Stage(fail_on_3, backend=ASYNC, queue_size=2), Stage(str, queue_size=1)],
+                       [Stage(abs, queue_size=2), Stage(fail_on_3, workers=2, backend=ASYNC, queue_size=2, batch_size=4)],
+                       [Stage(int, workers=2, queue_size=2), Stage(str, queue_size=1)]):
+            pipeline = AsyncPipeline(stages)
+            items = ['1', 'x', '3'] * 10 if stages[0].func is int else range(50)
+            with self.assertRaises(ValueError):
+                asyncio.run(asyncio.wait_for(pipeline.run(items), 5))
+
+    def test_async_queue_batches(self):
+        async def batches():
+            queue = AsyncClosableQueue()
+            await queue.put_many(range(7))
+            await queue.close(2)
+            first = [batch async for batch in queue.iter_batches(3)]
+            second = [batch async for batch in queue.iter_batches(3)]
+            queue.tasks_done(7)
+            await queue.join()
+            return first, second
+
+        self.assertEqual(([[0, 1, 2], [3, 4, 5], [6]], []), asyncio.run(batches()))
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 from __future__ import annotations
+from collections.abc import Iterable, Iterator, Mapping, MutableMapping
 from dataclasses import dataclass
 import unittest
 
@@ -10,15 +11,33 @@ class Node:
     next: Node = None
 
 
-class SeparateChainingHashST:
-    BUCKETS = 10007
+class SeparateChainingHashST(MutableMapping):
+    BUCKETS = 1 << 14
+    __MISSING = object()
 
-    def __init__(self):
+    def __init__(self, buckets: int = BUCKETS):
+        """
+        buckets is rounded up to a power of two, so the bucket index is a mask of the hash
+        """
+        self.__bucket_num: int = 1
+        while self.__bucket_num < buckets:
+            self.__bucket_num <<= 1
         self.__buckets = [Node(None, None)
-                          for _ in range(SeparateChainingHashST.BUCKETS)]
+                          for _ in range(self.__bucket_num)]
+        self.__len: int = 0
+
+    @classmethod
+    def from_items(cls, items: Iterable[tuple[object, object]]) -> SeparateChainingHashST:
+        """
+        builds the table with one bucket per item, so chains stay short without rehashing
+        """
+        items = items if isinstance(items, (list, tuple)) else list(items)
+        st = cls(len(items))
+        st.set_many(items)
+        return st
 
     def __get_bucket_idx(self, key: object) -> int:
-        return hash(key) & (SeparateChainingHashST.BUCKETS - 1)
+        return hash(key) & (self.__bucket_num - 1)
 
     def __find(self, bucketIdx: int, key: object) -> Node:
         prv = self.__buckets[bucketIdx]
@@ -27,8 +46,12 @@ class SeparateChainingHashST:
 
         return prv
 
+    def __lookup(self, key: object, default: object) -> object:
+        prv = self.__find(self.__get_bucket_idx(key), key)
+        return prv.next.val if prv.next else default
+
     def __setitem__(self, key: object, val: object):
-        if not key:
+        if key is None:
             raise Exception('key cannot be None')
         bucketIdx = self.__get_bucket_idx(key)
         prv = self.__find(bucketIdx, key)
@@ -36,30 +59,80 @@ class SeparateChainingHashST:
             prv.next.val = val
         else:
             prv.next = Node(key, val)
+            self.__len += 1
 
     def __getitem__(self, key: object) -> object:
-        if not key:
+        """
+        None if the key does not exist
+        """
+        if key is None:
             raise Exception('key cannot be None')
-        bucketIdx = self.__get_bucket_idx(key)
-        prv = self.__find(bucketIdx, key)
-        return prv.next.val if prv.next else None
+        return self.__lookup(key, None)
 
     def __delitem__(self, key: object):
-        if not key:
+        if key is None:
             raise Exception('key cannot be None')
         bucketIdx = self.__get_bucket_idx(key)
         prv = self.__find(bucketIdx, key)
         if prv.next == None:
-            raise Exception('key does not exist')
+            raise KeyError('key does not exist')
         prv.next = prv.next.next
+        self.__len -= 1
+
+    def __len__(self) -> int:
+        return self.__len
+
+    def __iter__(self) -> Iterator[object]:
+        for head in self.__buckets:
+            cur = head.next
+            while cur:
+                yield cur.key
+                cur = cur.next
+
+    def __contains__(self, key: object) -> bool:
+        return key is not None and self.__lookup(key, SeparateChainingHashST.__MISSING) is not SeparateChainingHashST.__MISSING
+
+    def get(self, key: object, default: object = None) -> object:
+        return default if key is None else self.__lookup(key, default)
+
+    def pop(self, key: object, default: object = __MISSING) -> object:
+        val = self.get(key, SeparateChainingHashST.__MISSING)
+        if val is SeparateChainingHashST.__MISSING:
+            if default is SeparateChainingHashST.__MISSING:
+                raise KeyError(key)
+            return default
+        del self[key]
+        return val
+
+    def setdefault(self, key: object, default: object = None) -> object:
+        val = self.get(key, SeparateChainingHashST.__MISSING)
+        if val is SeparateChainingHashST.__MISSING:
+            self[key] = val = default
+        return val
+
+    def update(self, other: Mapping | Iterable[tuple[object, object]] = (), /, **kwargs):
+        self.set_many(other.items() if isinstance(other, Mapping) else other)
+        self.set_many(kwargs.items())
+
+    def get_many(self, keys: Iterable[object], default: object = None) -> list[object]:
+        lookup = self.__lookup
+        return [lookup(key, default) for key in keys]
+
+    def set_many(self, items: Iterable[tuple[object, object]]):
+        setitem = self.__setitem__
+        for key, val in items:
+            setitem(key, val)
 
     def __repr__(self):
         return f'{self.__buckets}'
 
 
 class TestSeparateChainingHashST(unittest.TestCase):
+    # the map under test; subclasses swap in other implementations to run the same protocol tests
+    ST = SeparateChainingHashST
+
     def test_basic(self):
-        st = SeparateChainingHashST()
+        st = self.ST()
         st['1'] = 1
         self.assertEqual(1, st['1'])
         self.assertIsNone(st[1])
@@ -75,6 +148,20 @@ class TestSeparateChainingHashST(unittest.TestCase):
 
         self.assertIn('key does not exist', repr(exception_context.exception))
 
+    def test_dict_protocol(self):
+        st = self.ST.from_items((i, str(i)) for i in range(100))
+        self.assertEqual(100, len(st))
+        self.assertIn(0, st)
+        self.assertNotIn(100, st)
+        self.assertEqual('x', st.get(100, 'x'))
+        self.assertDictEqual({i: str(i) for i in range(100)}, dict(st.items()))
+        self.assertEqual('5', st.pop(5))
+        self.assertEqual(99, len(st))
+        self.assertIsNone(st.setdefault(5))
+        st.update({200: 'a'}, b=1)
+        self.assertEqual(['a', 1, None], st.get_many([200, 'b', 300]))
+        self.assertEqual(['a', 'x'], st.get_many([200, 300], 'x'))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,193 @@
+from __future__ import annotations
+from collections.abc import Iterable, Iterator, Mapping, MutableMapping
+from threading import Lock, Thread
+from time import perf_counter
+import unittest
+
+from separate_chaining_hash_map import SeparateChainingHashST
+
+
+class ShardedHashST(MutableMapping):
+    """
+    splits the keys over independent SeparateChainingHashST shards, each guarded by its own lock, so threads touching different shards do not contend
+    """
+    SHARDS = 31  # not a power of two, so the shard choice is independent of the bucket choice inside each shard
+    BUCKETS_PER_SHARD = 1024
+    __MISSING = object()
+
+    def __init__(self, shards: int = SHARDS, buckets_per_shard: int = BUCKETS_PER_SHARD):
+        self.__shards: list[SeparateChainingHashST] = [SeparateChainingHashST(buckets_per_shard) for _ in range(shards)]
+        self.__locks: list[Lock] = [Lock() for _ in range(shards)]
+
+    def __get_shard_idx(self, key: object) -> int:
+        return hash(key) % len(self.__shards)
+
+    def __getitem__(self, key: object) -> object:
+        """
+        None if the key does not exist
+        """
+        shard_idx = self.__get_shard_idx(key)
+        with self.__locks[shard_idx]:
+            return self.__shards[shard_idx][key]
+
+    def __setitem__(self, key: object, val: object):
+        shard_idx = self.__get_shard_idx(key)
+        with self.__locks[shard_idx]:
+            self.__shards[shard_idx][key] = val
+
+    def __delitem__(self, key: object):
+        shard_idx = self.__get_shard_idx(key)
+        with self.__locks[shard_idx]:
+            del self.__shards[shard_idx][key]
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.__shards)
+
+    def __iter__(self) -> Iterator[object]:
+        """
+        iterates a per-shard snapshot, so concurrent writers never invalidate the iterator
+        """
+        for shard, lock in zip(self.__shards, self.__locks):
+            with lock:
+                keys = list(shard)
+            yield from keys
+
+    def __contains__(self, key: object) -> bool:
+        shard_idx = self.__get_shard_idx(key)
+        with self.__locks[shard_idx]:
+            return key in self.__shards[shard_idx]
+
+    def get(self, key: object, default: object = None) -> object:
+        shard_idx = self.__get_shard_idx(key)
+        with self.__locks[shard_idx]:
+            return self.__shards[shard_idx].get(key, default)
+
+    def pop(self, key: object, default: object = __MISSING) -> object:
+        shard_idx = self.__get_shard_idx(key)
+        with self.__locks[shard_idx]:
+            if default is ShardedHashST.__MISSING:
+                return self.__shards[shard_idx].pop(key)
+            return self.__shards[shard_idx].pop(key, default)
+
+    def setdefault(self, key: object, default: object = None) -> object:
+        shard_idx = self.__get_shard_idx(key)
+        with self.__locks[shard_idx]:
+            return self.__shards[shard_idx].setdefault(key, default)
+
+    def update(self, other: Mapping | Iterable[tuple[object, object]] = (), /, **kwargs):
+        self.set_many(other.items() if isinstance(other, Mapping) else other)
+        self.set_many(kwargs.items())
+
+    def get_many(self, keys: Iterable[object], default: object = None) -> list[object]:
+        """
+        takes every shard lock at most once for the whole batch
+        """
+        keys = keys if isinstance(keys, (list, tuple)) else list(keys)
+        positions_by_shard: dict[int, list[int]] = {}
+        for pos, key in enumerate(keys):
+            positions_by_shard.setdefault(self.__get_shard_idx(key), []).append(pos)
+
+        result: list[object] = [default] * len(keys)
+        for shard_idx, positions in positions_by_shard.items():
+            with self.__locks[shard_idx]:
+                vals = self.__shards[shard_idx].get_many((keys[pos] for pos in positions), default)
+            for pos, val in zip(positions, vals):
+                result[pos] = val
+        return result
+
+    def set_many(self, items: Iterable[tuple[object, object]]):
+        """
+        takes every shard lock at most once for the whole batch
+        """
+        items_by_shard: dict[int, list[tuple[object, object]]] = {}
+        for key, val in items:
+            items_by_shard.setdefault(self.__get_shard_idx(key), []).append((key, val))
+
+        for shard_idx, shard_items in items_by_shard.items():
+            with self.__locks[shard_idx]:
+                self.__shards[shard_idx].set_many(shard_items)
+
+    def __repr__(self):
+        return f'{self.__shards}'
+
+
+class GlobalLockHashST:
+    """
+    the baseline: one SeparateChainingHashST behind a single lock
+    """
+
+    BUCKETS = 1 << 15  # the power of two closest to ShardedHashST's SHARDS * BUCKETS_PER_SHARD = 31744 buckets
+
+    def __init__(self, buckets: int = BUCKETS):
+        self.__st = SeparateChainingHashST(buckets)
+        self.__lock = Lock()
+
+    def __getitem__(self, key: object) -> object:
+        with self.__lock:
+            return self.__st[key]
+
+    def __setitem__(self, key: object, val: object):
+        with self.__lock:
+            self.__st[key] = val
+
+
+def benchmark(thread_counts: Iterable[int] = (1, 2, 4, 8), ops_per_thread: int = 50000):
+    """
+    prints the aggregate throughput of a 1:1 read/write mix for both tables at every thread count
+    """
+    def worker(st, thread_idx: int):
+        base = thread_idx * ops_per_thread
+        for i in range(base, base + ops_per_thread):
+            st[i] = i
+            st[i - 1]
+
+    for thread_count in thread_counts:
+        for factory in (GlobalLockHashST, ShardedHashST):
+            st = factory()
+            threads = [Thread(target=worker, args=(st, i)) for i in range(thread_count)]
+            start = perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = perf_counter() - start
+            print(f'{factory.__name__:>16} threads={thread_count:<3} {2 * ops_per_thread * thread_count / elapsed:>12.0f} ops/s')
+
+
+class ShardedHashSTTest(unittest.TestCase):
+    def test_basic(self):
+        st = ShardedHashST(4, 8)
+        st['1'] = 1
+        self.assertEqual(1, st['1'])
+        self.assertIsNone(st['2'])
+        self.assertIn('1', st)
+        self.assertEqual(1, st.pop('1'))
+        self.assertEqual(0, len(st))
+        self.assertRaises(KeyError, st.pop, '1')
+
+    def test_batch(self):
+        st = ShardedHashST(4, 8)
+        st.set_many((i, str(i)) for i in range(100))
+        self.assertEqual([str(i) for i in range(100)] + [None], st.get_many(range(101)))
+        self.assertEqual(set(range(100)), set(st))
+
+    def test_concurrent_writers(self):
+        st = ShardedHashST(4, 8)
+
+        def write(thread_idx: int):
+            for i in range(thread_idx * 1000, (thread_idx + 1) * 1000):
+                st[i] = i
+                st.setdefault('counter', 0)
+
+        threads = [Thread(target=write, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(8001, len(st))
+        self.assertEqual(list(range(8000)), st.get_many(range(8000)))
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,230 @@
+from __future__ import annotations
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable
+from itertools import accumulate
+import unittest
+
+import binary_search_tree
+
+
+class SortedListMap:
+    """
+    an ordered map with the BinarySearchTree API, storing keys in a list of sorted chunks of about LOAD keys each;
+    maxes[i] is the largest key of chunk i, so a lookup is a bisect over maxes followed by a bisect inside one chunk
+    """
+    LOAD = 512
+
+    def __init__(self, load: int = LOAD):
+        self.__load: int = load
+        self.__keys: list[list[object]] = []
+        self.__vals: list[list[object]] = []
+        self.__maxes: list[object] = []
+        self.__len: int = 0
+        self.__offsets: list[int] = None  # offsets[i] is the number of keys before chunk i, rebuilt lazily after a change
+
+    @classmethod
+    def from_sorted(cls, items: Iterable[tuple[object, object]], load: int = LOAD) -> SortedListMap:
+        """
+        bulk-loads strictly increasing (key, val) pairs in O(n) by slicing them into full chunks
+        """
+        result = cls(load)
+        keys: list[object] = []
+        vals: list[object] = []
+        for key, val in items:
+            if keys and not keys[-1] < key:
+                raise Exception('keys are not strictly increasing')
+            keys.append(key)
+            vals.append(val)
+
+        for start in range(0, len(keys), load):
+            result.__keys.append(keys[start:start + load])
+            result.__vals.append(vals[start:start + load])
+            result.__maxes.append(result.__keys[-1][-1])
+        result.__len = len(keys)
+        return result
+
+    def insert(self, key: object, val: object) -> bool:
+        """
+        True if insertion succeeds; otherwise False, indicating the key has already existed in the tree.
+        """
+        if not self.__maxes:
+            self.__keys.append([key])
+            self.__vals.append([val])
+            self.__maxes.append(key)
+            self.__len = 1
+            self.__offsets = None
+            return True
+
+        chunk_idx = min(bisect_left(self.__maxes, key), len(self.__maxes) - 1)
+        keys = self.__keys[chunk_idx]
+        pos = bisect_left(keys, key)
+        if pos < len(keys) and keys[pos] == key:
+            return False
+
+        keys.insert(pos, key)
+        self.__vals[chunk_idx].insert(pos, val)
+        self.__maxes[chunk_idx] = keys[-1]
+        self.__len += 1
+        self.__offsets = None
+        if len(keys) > 2 * self.__load:
+            self.__split(chunk_idx)
+        return True
+
+    def __split(self, chunk_idx: int):
+        keys, vals = self.__keys[chunk_idx], self.__vals[chunk_idx]
+        half = len(keys) // 2
+        self.__keys[chunk_idx:chunk_idx + 1] = [keys[:half], keys[half:]]
+        self.__vals[chunk_idx:chunk_idx + 1] = [vals[:half], vals[half:]]
+        self.__maxes[chunk_idx:chunk_idx + 1] = [keys[half - 1], keys[-1]]
+
+    def delete(self, key: object):
+        chunk_idx = bisect_left(self.__maxes, key)
+        if chunk_idx == len(self.__maxes):
+            raise Exception(f'cannot find {key}')
+        keys = self.__keys[chunk_idx]
+        pos = bisect_left(keys, key)
+        if keys[pos] != key:
+            raise Exception(f'cannot find {key}')
+
+        del keys[pos]
+        del self.__vals[chunk_idx][pos]
+        self.__len -= 1
+        self.__offsets = None
+        if not keys:
+            del self.__keys[chunk_idx]
+            del self.__vals[chunk_idx]
+            del self.__maxes[chunk_idx]
+            return
+        self.__maxes[chunk_idx] = keys[-1]
+        if len(keys) < self.__load // 2 and len(self.__keys) > 1:
+            self.__merge(chunk_idx if chunk_idx + 1 < len(self.__keys) else chunk_idx - 1)
+
+    def __merge(self, chunk_idx: int):
+        """
+        merges chunk chunk_idx with the following one, splitting the result again if it is too large
+        """
+        self.__keys[chunk_idx].extend(self.__keys.pop(chunk_idx + 1))
+        self.__vals[chunk_idx].extend(self.__vals.pop(chunk_idx + 1))
+        self.__maxes[chunk_idx] = self.__maxes.pop(chunk_idx + 1)
+        if len(self.__keys[chunk_idx]) > 2 * self.__load:
+            self.__split(chunk_idx)
+
+    def find(self, key: object) -> object:
+        chunk_idx = bisect_left(self.__maxes, key)
+        if chunk_idx == len(self.__maxes):
+            return None
+        keys = self.__keys[chunk_idx]
+        pos = bisect_left(keys, key)
+        return self.__vals[chunk_idx][pos] if keys[pos] == key else None
+
+    def __len__(self) -> int:
+        return self.__len
+
+    def floor(self, key: object) -> tuple[object, object]:
+        """
+        (key, val) of the largest key not larger than key, or None
+        """
+        chunk_idx = bisect_left(self.__maxes, key)
+        pos = bisect_right(self.__keys[chunk_idx], key) if chunk_idx < len(self.__maxes) else 0
+        if not pos:
+            if not chunk_idx:
+                return None
+            chunk_idx -= 1
+            pos = len(self.__keys[chunk_idx])
+        return (self.__keys[chunk_idx][pos - 1], self.__vals[chunk_idx][pos - 1])
+
+    def ceiling(self, key: object) -> tuple[object, object]:
+        """
+        (key, val) of the smallest key not smaller than key, or None
+        """
+        chunk_idx = bisect_left(self.__maxes, key)
+        if chunk_idx == len(self.__maxes):
+            return None
+        pos = bisect_left(self.__keys[chunk_idx], key)
+        return (self.__keys[chunk_idx][pos], self.__vals[chunk_idx][pos])
+
+    def range(self, lo: object, hi: object):
+        """
+        yields (key, val) for lo <= key < hi in key order
+        """
+        chunk_idx = bisect_left(self.__maxes, lo)
+        if chunk_idx == len(self.__maxes):
+            return
+        pos = bisect_left(self.__keys[chunk_idx], lo)
+        while chunk_idx < len(self.__keys):
+            keys, vals = self.__keys[chunk_idx], self.__vals[chunk_idx]
+            end = bisect_left(keys, hi, pos)
+            yield from zip(keys[pos:end], vals[pos:end])
+            if end < len(keys):
+                return
+            chunk_idx, pos = chunk_idx + 1, 0
+
+    def __get_offsets(self) -> list[int]:
+        if self.__offsets is None:
+            self.__offsets = [0]
+            self.__offsets.extend(accumulate(len(keys) for keys in self.__keys))
+        return self.__offsets
+
+    def rank(self, key: object) -> int:
+        """
+        number of keys smaller than key
+        """
+        chunk_idx = bisect_left(self.__maxes, key)
+        if chunk_idx == len(self.__maxes):
+            return self.__len
+        return self.__get_offsets()[chunk_idx] + bisect_left(self.__keys[chunk_idx], key)
+
+    def select(self, k: int) -> tuple[object, object]:
+        """
+        (key, val) of the k-th (0-based) smallest key
+        """
+        if k < 0 or k >= self.__len:
+            raise Exception('out of range')
+        offsets = self.__get_offsets()
+        chunk_idx = bisect_right(offsets, k) - 1
+        pos = k - offsets[chunk_idx]
+        return (self.__keys[chunk_idx][pos], self.__vals[chunk_idx][pos])
+
+    def __iter__(self):
+        for keys, vals in zip(self.__keys, self.__vals):
+            yield from zip(keys, vals)
+
+
+class SortedListMapTest(binary_search_tree.BstTest):
+    # tiny chunks, so the shared tests exercise splitting and merging
+    TREE = staticmethod(lambda: SortedListMap(4))
+
+    @unittest.skip('SortedListMap has no nodes')
+    def test_parent_pointers(self):
+        pass
+
+    def test_from_sorted(self):
+        sorted_map = SortedListMap.from_sorted(((i, str(i)) for i in range(0, 100, 2)), 8)
+        self.assertEqual(50, len(sorted_map))
+        self.assertListEqual([(i, str(i)) for i in range(0, 100, 2)], list(sorted_map))
+        self.assertTrue(sorted_map.insert(51, '51'))
+        self.assertEqual('51', sorted_map.find(51))
+        self.assertEqual(27, sorted_map.rank(52))
+        self.assertRaises(Exception, SortedListMap.from_sorted, [(1, 'A'), (1, 'B')])
+        self.assertEqual(0, len(SortedListMap.from_sorted([])))
+
+    def test_many_chunks(self):
+        sorted_map = SortedListMap(4)
+        keys = [(i * 37) % 1009 for i in range(1009)]
+        for key in keys:
+            sorted_map.insert(key, key)
+        for key in keys[::2]:
+            sorted_map.delete(key)
+        remaining = sorted(keys[1::2])
+        self.assertListEqual([(key, key) for key in remaining], list(sorted_map))
+        self.assertListEqual([(key, key) for key in remaining if 100 <= key < 600], list(sorted_map.range(100, 600)))
+        for k in range(0, len(remaining), 17):
+            self.assertEqual((remaining[k], remaining[k]), sorted_map.select(k))
+        for key in remaining:
+            sorted_map.delete(key)
+        self.assertListEqual([], list(sorted_map))
+        self.assertIsNone(sorted_map.floor(5))
+
+
+if __name__ == '__main__':
+    unittest.main()